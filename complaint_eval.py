@@ -4,8 +4,10 @@
 Enhanced JSON row enricher for Ollama/Mistral (V2 - Refactored + Logging & Perf Monitor)
 
 - Liest JSON (flat oder Excel-Export-Struktur).
-- Fragt pro Row vier Klassifikationen + Summary bei lokaler Ollama/Mistral-Instanz ab.
+- Fragt pro Row vier Klassifikationen + Summary bei lokaler Ollama/Mistral-Instanz ab
+  (ein kombinierter JSON-Call pro Row; Einzelfragen nur als Fallback; mehrere Rows parallel).
 - Ergänzt neue Spalten und erhält Originalstruktur.
+- Cacht LLM-Antworten persistent (SQLite, exakter Prompt-Hash) und optional semantisch pro Row.
 - Schreibt ausführliches Log (Konsole + Datei) mit Zeitstempeln, Modell- & Systeminfos,
   Performance-Zeitreihe (CPU/RAM/GPU, wenn verfügbar), Laufzeiten pro Row und Gesamtzeit.
 
@@ -13,7 +15,12 @@ Requirements:
     - Python 3.9+
     - requests
     - (optional) psutil für CPU/RAM-Infos
+    - (optional) orjson für schnelleres JSON-Lesen/-Schreiben
+    - (optional) ijson für Streaming-Input (--stream)
     - (optional) pynvml für NVIDIA-GPU-Infos
+    - (optional) httpx (+ h2 für HTTP/2) für native async Requests; ohne httpx wird requests genutzt
+    - (optional) aiolimiter für das Rate-Limit (--qpm); sonst eingebauter Token-Bucket
+    - (optional) sentence-transformers + faiss + numpy für den semantischen Row-Cache (--semantic-cache)
     - Ollama (http://localhost:11434) + passendes Mistral-Instruct-Modell
 """
 
@@ -26,15 +33,30 @@ from __future__ import annotations
 DEFAULT_INPUT_PATH = r"C:\Users\Alex.bernhard\OneDrive - Olympus\Organisatorisches\KI_Projekte\Complaint_Analysis\ETQ_Filtered.json"
 DEFAULT_OUTPUT_PATH = r"C:\Users\Alex.bernhard\OneDrive - Olympus\Organisatorisches\KI_Projekte\Complaint_Analysis\Output.json"
 DEFAULT_LOG_PATH = r"C:\Users\Alex.bernhard\OneDrive - Olympus\Organisatorisches\KI_Projekte\Complaint_Analysis\run.log"
+DEFAULT_CACHE_PATH = r"C:\Users\Alex.bernhard\OneDrive - Olympus\Organisatorisches\KI_Projekte\Complaint_Analysis\llm_cache.sqlite"
 PERF_SAMPLING_SEC = 600.0  # Intervall für CPU/RAM/GPU-Samples
 
 # Ollama / Model settings
 OLLAMA_HOST = "http://localhost:11434"
 OLLAMA_MODEL = "mistral:7b-instruct"   # e.g., "mistral", "mistral:7b-instruct"
 TEMPERATURE = 0.0                      # very low for reproducibility
-NUM_PREDICT = 128                      # per question; raise if answers get cut
+NUM_PREDICT = 128                      # default for direct call_ollama_chat calls
+NUM_PREDICT_MAP = {                    # per single-question kind; --num_predict overrides all of them
+    "yesno": 2,                        # "Yes" / "No"
+    "label": 12,                       # longest label ~8 tokens
+    "summary": 180,
+}
+CLASSIFIER_STOP = ["\n"]               # classifiers answer on one line; stop decoding after it
+NUM_PREDICT_COMBINED = 400             # combined JSON answer (4 labels + summary) per row
+KEEP_ALIVE = "30m"                     # keep model + KV cache loaded between requests
 TIMEOUT_SEC = 120.0
-REQUEST_DELAY_SEC = 1.0                # optional sleep between requests for each ROW
+MAX_QPM = 0                            # max. Ollama requests per minute (token bucket, bursts allowed); 0 = unlimited
+MAX_PARALLEL = 4                       # parallel requests/rows; match the server's OLLAMA_NUM_PARALLEL
+BATCH_SIZE = 1                         # rows per LLM call (row-marshaling); 1 = off, tune e.g. 4-8 by measuring
+
+# Semantic row cache (optional, --semantic-cache)
+SEMANTIC_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+SEMANTIC_THRESHOLD = 0.95              # cosine similarity needed to reuse the answers of a cached row
 
 # Label sets (kept strict to force exact labels & quotes)
 STRICT_YESNO = ("Yes", "No")
@@ -51,6 +73,18 @@ PATIENT_HARM_LABELS = (
     "none",
 )
 
+# Pre-filter (opt-in, --prefilter): rows whose relevant columns contain NONE of these word prefixes
+# (case-insensitive) are answered without the model (breakage/ceramic = No, harm = none; detected and Summary empty).
+# English keywords only: for German row texts leave it off.
+PREFILTER_KEYWORDS = (
+    # breakage / ceramic tip
+    "break", "broke", "crack", "fractur", "shatter", "chip", "split", "snap", "fragment", "piece",
+    "ceramic", "tip", "beak",
+    # patient harm
+    "bleed", "blood", "lacerat", "complicat", "adverse", "injur", "harm", "tissue damage",
+    "extended surgery", "delay", "perforat", "burn",
+)
+
 # The NEW columns to be added to each row (keys must match desired headers):
 NEW_COLUMNS = [
     "Issue related to breakage?",
@@ -62,17 +96,22 @@ NEW_COLUMNS = [
 # =============================
 
 import argparse
+import asyncio
+import hashlib
 import json
 import logging
 import sys
 import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, Union
-from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import itertools
 import os
 import platform
+import re
+import sqlite3
 import threading
 import datetime
+import uuid
 
 try:
     import psutil  # optional: CPU/RAM/Per-Process-Metriken
@@ -82,8 +121,35 @@ try:
     import pynvml  # optional: NVIDIA GPU
 except Exception:
     pynvml = None
+try:
+    import orjson  # optional: schnelles JSON-Lesen/-Schreiben (Rust)
+except Exception:
+    orjson = None
+try:
+    import ijson  # optional: Streaming-Parser für große Inputs
+except Exception:
+    ijson = None
+try:
+    import httpx  # optional: async HTTP client
+except Exception:
+    httpx = None
+try:
+    import h2  # optional: HTTP/2 support for httpx
+except Exception:
+    h2 = None
+try:
+    from aiolimiter import AsyncLimiter  # optional: rate limit (--qpm)
+except Exception:
+    AsyncLimiter = None
+try:
+    import numpy as np  # optional: semantischer Cache
+    import faiss
+    from sentence_transformers import SentenceTransformer
+except Exception:
+    np = faiss = SentenceTransformer = None
 
 import requests
+from requests.adapters import HTTPAdapter
 
 # -----------------------------
 # Logging: zeitgestempelt, Konsole + Datei, single-sentence pro Row.
@@ -106,6 +172,14 @@ logger.addHandler(file_handler)
 # Doppellogging ins Root-Logger vermeiden
 logger.propagate = False
 
+# -----------------------------
+# HTTP-Session: Keep-Alive + Connection-Pool für alle Ollama-Requests (auch aus Worker-Threads)
+# -----------------------------
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=0))
+_SESSION.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=0))
+_SESSION.headers.update({"Connection": "keep-alive", "Accept-Encoding": "gzip"})
+
 # -----------------------------
 # Modell-Info von Ollama
 # -----------------------------
@@ -116,7 +190,7 @@ def fetch_model_info(host: str, model: str) -> Dict[str, Any]:
     """
     try:
         url = f"{host.rstrip('/')}/api/show"
-        resp = requests.post(url, json={"name": model}, timeout=TIMEOUT_SEC)
+        resp = _SESSION.post(url, json={"name": model}, timeout=TIMEOUT_SEC)
         resp.raise_for_status()
         data = resp.json() or {}
         info = {
@@ -255,11 +329,14 @@ class PerformanceMonitor(threading.Thread):
 def load_rows_from_json(json_path: Path) -> Tuple[List[Dict[str, Any]], Optional[List[str]], Any]:
     """Loads rows and headers from JSON, returning the original data structure as well."""
     try:
-        original_data = json.loads(json_path.read_text(encoding="utf-8"))
+        if orjson:
+            original_data = orjson.loads(json_path.read_bytes())
+        else:
+            original_data = json.loads(json_path.read_text(encoding="utf-8"))
     except FileNotFoundError:
         logger.error(f"Input file not found: {json_path}")
         raise
-    except json.JSONDecodeError as e:
+    except json.JSONDecodeError as e:  # orjson.JSONDecodeError is a subclass
         logger.error(f"Invalid JSON in input file: {e}")
         raise
 
@@ -306,10 +383,191 @@ def load_rows_from_json(json_path: Path) -> Tuple[List[Dict[str, Any]], Optional
 
     raise ValueError("Cannot detect supported structure (no list and no 'sheets').")
 
+def _load_envelope(json_path: Path) -> Tuple[Any, Optional[str]]:
+    """
+    Streams the whole JSON into memory EXCEPT the rows of the first table of the first sheet
+    (they stay as an empty list). Returns (envelope, first sheet key).
+    """
+    builder = ijson.ObjectBuilder()
+    sheet_key: Optional[str] = None
+    tables_prefix = rows_prefix = None
+    table_idx = -1
+    skipping = False
+    with json_path.open("rb") as f:
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            if sheet_key is None and prefix == "sheets" and event == "map_key":
+                sheet_key = value
+                tables_prefix = f"sheets.{value}.excel_tables.item"
+                rows_prefix = f"{tables_prefix}.rows"
+            elif prefix == tables_prefix and event == "start_map":
+                table_idx += 1
+            if table_idx == 0 and prefix == rows_prefix and event in ("start_array", "end_array"):
+                skipping = event == "start_array"
+                builder.event(event, value)  # keep "rows": [] as placeholder
+                continue
+            if skipping:
+                continue
+            builder.event(event, value)
+    return builder.value, sheet_key
+
+def _iter_items(json_path: Path, item_prefix: str, container_prefix: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the objects at ijson prefix item_prefix one by one. With container_prefix (the prefix of the
+    first table), only objects of its FIRST occurrence are yielded.
+    """
+    builder = None
+    with json_path.open("rb") as f:
+        containers_seen = 0
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            if container_prefix is not None and prefix == container_prefix and event == "start_map":
+                containers_seen += 1
+                if containers_seen > 1:
+                    return
+            if prefix == item_prefix and event == "start_map":
+                builder = ijson.ObjectBuilder()
+            if builder is not None:
+                builder.event(event, value)
+                if prefix == item_prefix and event == "end_map":
+                    yield builder.value
+                    builder = None
+
+def stream_rows_from_json(json_path: Path) -> Tuple[Iterator[Dict[str, Any]], Optional[List[str]], Any]:
+    """
+    Streaming variant of load_rows_from_json (needs ijson): same structures are supported, but the rows
+    are returned as a lazy iterator and the original data without those rows (filled again on output).
+    """
+    with json_path.open("rb") as f:
+        first_event = next(ijson.parse(f), (None, None, None))[1]
+
+    headers: Optional[List[str]] = None
+    if first_event == "start_array":
+        # Case A: direct list of objects
+        envelope: Any = []
+        rows_iter = _iter_items(json_path, "item")
+    elif first_event == "start_map":
+        # Case B: nested Excel structure
+        envelope, sheet_key = _load_envelope(json_path)
+        sheets = envelope.get("sheets", {})
+        if not sheets:
+            raise ValueError("Cannot detect supported structure (no list and no 'sheets').")
+        if len(sheets) > 1:
+            logger.warning(f"Found {len(sheets)} sheets; only processing the first one.")
+        first_sheet = sheets[sheet_key]
+        if not first_sheet:
+            raise ValueError("Found 'sheets' but it is empty.")
+        tables = first_sheet.get("excel_tables", [])
+        if not tables:
+            raise ValueError("Missing 'excel_tables' in first sheet.")
+        headers = tables[0].get("headers", None)
+        tables_prefix = f"sheets.{sheet_key}.excel_tables.item"
+        rows_iter = _iter_items(json_path, f"{tables_prefix}.rows.item", container_prefix=tables_prefix)
+    else:
+        raise ValueError("Unexpected JSON: neither dict nor list.")
+
+    first_row = next(rows_iter, None)
+    if first_row is None:
+        raise ValueError("No rows found in 'rows'." if envelope != [] else "JSON list found, but does not contain objects.")
+    # Fallback to infer headers from the first row if not explicitly provided
+    if headers is None:
+        headers = list(first_row.keys())
+    return itertools.chain([first_row], rows_iter), headers, envelope
+
+# -----------------------------
+# Output writer
+# -----------------------------
+
+def _dumps_compact(obj: Any) -> bytes:
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class RowsWriter:
+    """
+    Writes output_obj with the rows as rows_parent["rows"] (rows_parent=None: the rows are the whole document).
+    Default: compact JSON, each row is written as soon as it is passed to write(), so neither the rows nor
+    the complete document are held in memory. pretty=True: indent=2 in one go on close (keeps all rows).
+    Writes to "<out>.part" and replaces out_path only on close(); abort() removes the partial file.
+    """
+    def __init__(self, out_path: Path, output_obj: Any, rows_parent: Optional[Dict[str, Any]], pretty: bool = False):
+        self.out_path = out_path
+        self.count = 0
+        self._output_obj = output_obj
+        self._rows_parent = rows_parent
+        self._part_path = out_path.with_name(out_path.name + ".part")
+        self._rows_list: Optional[List[Dict[str, Any]]] = [] if pretty else None
+        self._f = None
+        self._tail = b""
+        if pretty:
+            return
+        # Envelope with a unique placeholder for the rows; rows are streamed between head and tail
+        placeholder = f"__rows_{uuid.uuid4().hex}__"
+        if rows_parent is None:
+            envelope = _dumps_compact(placeholder)
+        else:
+            rows_parent["rows"] = placeholder
+            envelope = _dumps_compact(output_obj)
+        head, self._tail = envelope.split(f'"{placeholder}"'.encode("utf-8"), 1)
+        self._f = self._part_path.open("wb")
+        self._f.write(head)
+        self._f.write(b"[")
+
+    def write(self, row: Dict[str, Any]) -> None:
+        if self._rows_list is not None:
+            self._rows_list.append(row)
+        else:
+            if self.count:
+                self._f.write(b",")
+            self._f.write(_dumps_compact(row))
+        self.count += 1
+
+    def close(self) -> None:
+        if self._rows_list is not None:
+            output_obj = self._output_obj
+            if self._rows_parent is None:
+                output_obj = self._rows_list
+            else:
+                self._rows_parent["rows"] = self._rows_list
+            if orjson:
+                self._part_path.write_bytes(orjson.dumps(output_obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+            else:
+                self._part_path.write_text(json.dumps(output_obj, ensure_ascii=False, indent=2), encoding="utf-8")
+        else:
+            self._f.write(b"]")
+            self._f.write(self._tail)
+            self._f.close()
+        os.replace(self._part_path, self.out_path)
+
+    def abort(self) -> None:
+        if self._f is not None:
+            self._f.close()
+        self._part_path.unlink(missing_ok=True)
+
 # -----------------------------
 # Ollama chat helper
 # -----------------------------
 
+def _build_chat_payload(
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    num_predict: int,
+    response_format: Optional[str],
+    stop: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """Builds the /api/chat request body (shared by the sync and the async client)."""
+    payload = {
+        "model": model,
+        "messages": messages,
+        "stream": False,
+        "keep_alive": KEEP_ALIVE,
+        "options": {"temperature": temperature, "num_predict": num_predict},
+    }
+    if stop:
+        payload["options"]["stop"] = stop
+    if response_format:
+        payload["format"] = response_format
+    return payload
+
 def call_ollama_chat(
     model: str,
     messages: List[Dict[str, str]],
@@ -317,17 +575,17 @@ def call_ollama_chat(
     temperature: float = TEMPERATURE,
     num_predict: int = NUM_PREDICT,
     timeout: float = TIMEOUT_SEC,
+    response_format: Optional[str] = None,
+    stop: Optional[List[str]] = None,
 ) -> Optional[str]:
-    """Calls the Ollama chat API and returns the content or None on error."""
+    """Calls the Ollama chat API and returns the content or None on error.
+
+    response_format="json" lets Ollama constrain the output to valid JSON; stop ends decoding early.
+    """
     url = f"{host.rstrip('/')}/api/chat"
-    payload = {
-        "model": model,
-        "messages": messages,
-        "stream": False,
-        "options": {"temperature": temperature, "num_predict": num_predict},
-    }
+    payload = _build_chat_payload(model, messages, temperature, num_predict, response_format, stop)
     try:
-        resp = requests.post(url, json=payload, timeout=timeout)
+        resp = _SESSION.post(url, json=payload, timeout=timeout)
         resp.raise_for_status()
         data = resp.json()
         content = data.get("message", {}).get("content", "")
@@ -339,93 +597,426 @@ def call_ollama_chat(
         logger.error(f"An unexpected error occurred during API call: {e}")
         return None
 
+_ASYNC_CLIENT = None  # httpx.AsyncClient; lazily created inside the running loop (see _get_async_client)
+
+def _get_async_client():
+    """Returns the shared httpx.AsyncClient (HTTP/2 if h2 is installed), creating it on first use."""
+    global _ASYNC_CLIENT
+    if _ASYNC_CLIENT is None:
+        _ASYNC_CLIENT = httpx.AsyncClient(
+            http2=h2 is not None,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=40),
+        )
+    return _ASYNC_CLIENT
+
+async def _close_async_client() -> None:
+    global _ASYNC_CLIENT
+    if _ASYNC_CLIENT is not None:
+        await _ASYNC_CLIENT.aclose()
+        _ASYNC_CLIENT = None
+
+async def call_ollama_chat_async(
+    model: str,
+    messages: List[Dict[str, str]],
+    host: str = OLLAMA_HOST,
+    temperature: float = TEMPERATURE,
+    num_predict: int = NUM_PREDICT,
+    timeout: float = TIMEOUT_SEC,
+    response_format: Optional[str] = None,
+    stop: Optional[List[str]] = None,
+) -> Optional[str]:
+    """Async variant of call_ollama_chat using httpx; returns the content or None on error."""
+    url = f"{host.rstrip('/')}/api/chat"
+    payload = _build_chat_payload(model, messages, temperature, num_predict, response_format, stop)
+    try:
+        resp = await _get_async_client().post(url, json=payload, timeout=httpx.Timeout(timeout, connect=10.0))
+        resp.raise_for_status()
+        data = resp.json()
+        content = data.get("message", {}).get("content", "")
+        return (content or "").strip()
+    except httpx.HTTPError as e:
+        logger.error(f"Ollama API request failed: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during API call: {e}")
+        return None
+
+# -----------------------------
+# Response-Cache: exakter Prompt-Hash (SQLite) + optional semantisch pro Row
+# -----------------------------
+
+class ResponseCache:
+    """
+    Persistenter Exact-Match-Cache für LLM-Antworten.
+    Key = SHA-256 über den kompletten Chat-Payload (Modell, Messages, Optionen, Format) plus den
+    Modell-Digest von /api/show: nach einem "ollama pull" werden alte Antworten nicht mehr verwendet.
+    Wird nur aus dem asyncio-Loop-Thread benutzt.
+    """
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path))
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key BLOB PRIMARY KEY, response TEXT NOT NULL, ts REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(payload: Dict[str, Any], model_digest: Optional[str]) -> bytes:
+        raw = json.dumps([model_digest, payload], ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).digest()
+
+    def get(self, key: bytes) -> Optional[str]:
+        row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, key: bytes, response: str) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, response, ts) VALUES (?, ?, ?)", (key, response, time.time())
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+class SemanticRowCache:
+    """
+    Optionaler semantischer Cache: Rows, deren relevante Textfelder (RELEVANT_FIELDS) nahezu gleich sind
+    (Cosine-Similarity >= threshold), übernehmen die Antworten einer bereits bewerteten Row.
+    Embeddings liegen in derselben SQLite-Datei und werden beim Start in einen FAISS-Index geladen.
+    """
+    def __init__(self, path: Path, llm_model: str, embed_model: str = SEMANTIC_MODEL, threshold: float = SEMANTIC_THRESHOLD):
+        self.threshold = threshold
+        self.hits = 0
+        self._llm_model = llm_model
+        self._encoder = SentenceTransformer(embed_model)
+        self._index = faiss.IndexFlatIP(self._encoder.get_sentence_embedding_dimension())
+        self._answers: List[Dict[str, Tuple[str, bool]]] = []
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path))
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS semantic_rows (id INTEGER PRIMARY KEY, model TEXT NOT NULL, embedding BLOB NOT NULL, answers TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        stored = self._conn.execute("SELECT embedding, answers FROM semantic_rows WHERE model = ?", (llm_model,)).fetchall()
+        if stored:
+            self._index.add(np.stack([np.frombuffer(emb, dtype=np.float32) for emb, _ in stored]))
+            self._answers = [{k: tuple(v) for k, v in json.loads(ans).items()} for _, ans in stored]
+
+    @staticmethod
+    def row_text(row: Dict[str, Any]) -> str:
+        """Text der relevanten Felder; leer, wenn keines davon befüllt ist."""
+        return "\n".join(f"{f}: {row[f]}" for f in RELEVANT_FIELDS if row.get(f) not in (None, ""))
+
+    def embed(self, text: str):
+        """Normalisiertes Embedding (1 x dim, float32) – CPU-lastig, daher im Worker-Thread aufrufen."""
+        return self._encoder.encode([text], normalize_embeddings=True).astype(np.float32)
+
+    def lookup(self, embedding) -> Optional[Dict[str, Tuple[str, bool]]]:
+        if self._index.ntotal == 0:
+            return None
+        sims, ids = self._index.search(embedding, 1)
+        if sims[0][0] >= self.threshold:
+            self.hits += 1
+            return dict(self._answers[ids[0][0]])
+        return None
+
+    def add(self, embedding, answers: Dict[str, Tuple[str, bool]]) -> None:
+        self._index.add(embedding)
+        self._answers.append(dict(answers))
+        self._conn.execute(
+            "INSERT INTO semantic_rows (model, embedding, answers) VALUES (?, ?, ?)",
+            (self._llm_model, embedding[0].tobytes(), json.dumps(answers, ensure_ascii=False)),
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+_cache: Optional[ResponseCache] = None  # set in main unless --no-cache
+_model_digest: Optional[str] = None  # model digest from /api/show (set in main), part of every cache key
+_semantic_cache: Optional[SemanticRowCache] = None  # set in main with --semantic-cache
+
+def _close_caches() -> None:
+    global _cache, _semantic_cache
+    if _cache is not None:
+        logger.info(f"LLM cache: hits={_cache.hits} misses={_cache.misses}")
+        _cache.close()
+        _cache = None
+    if _semantic_cache is not None:
+        logger.info(f"Semantic row cache: hits={_semantic_cache.hits}")
+        _semantic_cache.close()
+        _semantic_cache = None
+
 # -----------------------------
 # System and User Prompts
 # -----------------------------
 
+# Alle statischen Anweisungen (Task, Label-Sets, Hinweise) stehen in der System-Message, die Row nur am Ende
+# der User-Message: so bleibt der Prompt-Prefix pro Fragetyp über alle Rows identisch und Ollama kann
+# den KV-Cache dafür wiederverwenden, statt ihn bei jeder Row neu zu berechnen.
+
 SYSTEM_PROMPT = (
     "You are a precise, bilingual data assistant working on single table rows. "
     "Only output what is requested. Keep outputs minimal, English-only, and deterministic."
 )
 
-def prompt_yesno_breakage(row_json: str) -> str:
-    return f"""Task: Decide if the issue is related to breakage based on the row content.
+SYSTEM_PROMPT_BREAKAGE = SYSTEM_PROMPT + """
+Task: Decide if the issue is related to breakage based on the row content.
 Allowed answers: Yes or No. Output exactly one word: Yes or No.
-Evidence is in this JSON row. Consider fields such as 'H6 Medical Device Problem Code', 'Event Description', 'Evaluation Result', 'Investigation Conclusion' and related text.
-Row JSON:
-{row_json}"""
+Evidence is in the JSON row. Consider fields such as 'H6 Medical Device Problem Code', 'Event Description', 'Evaluation Result', 'Investigation Conclusion' and related text."""
 
-def prompt_yesno_ceramic(row_json: str) -> str:
-    return f"""Task: Decide if the issue is related to the ceramic tip based on the row content.
+SYSTEM_PROMPT_CERAMIC = SYSTEM_PROMPT + """
+Task: Decide if the issue is related to the ceramic tip based on the row content.
 Search for explicit mentions and close synonyms like ceramic tip, ceramic beak, tip, beak, or phrasing indicating ceramic-part damage.
-Allowed answers: Yes or No. Output exactly one word: Yes or No.
-Row JSON:
-{row_json}"""
+Allowed answers: Yes or No. Output exactly one word: Yes or No."""
 
-def prompt_detected_when(row_json: str) -> str:
-    labels = " | ".join(DETECTED_LABELS)
-    return f"""Task: Classify WHEN the issue was detected based on the row content.
+SYSTEM_PROMPT_DETECTED = SYSTEM_PROMPT + f"""
+Task: Classify WHEN the issue was detected based on the row content.
 Choose exactly ONE of these labels and output it verbatim (no extra text):
-{labels}
-Hints: before the operation -> During Inspection; intraoperative -> During Operation; found during cleaning/sterilization -> During Reprocessing; service scenarios -> During Service Activities; later follow-up of the patient -> During follow-up Examination of Patient.
-Row JSON:
-{row_json}"""
-
-def prompt_patient_harm(row_json: str) -> str:
-    labels = " | ".join(PATIENT_HARM_LABELS)
-    return f"""Task: Classify the type of patient harm based on the row content.
+{" | ".join(DETECTED_LABELS)}
+Hints: before the operation -> During Inspection; intraoperative -> During Operation; found during cleaning/sterilization -> During Reprocessing; service scenarios -> During Service Activities; later follow-up of the patient -> During follow-up Examination of Patient."""
+
+SYSTEM_PROMPT_HARM = SYSTEM_PROMPT + f"""
+Task: Classify the type of patient harm based on the row content.
 Choose exactly ONE of these labels and output it verbatim (no extra text):
-{labels}
+{" | ".join(PATIENT_HARM_LABELS)}
 Instructions:
 1.  **Actively search for evidence** of patient harm. Focus your analysis on text fields like 'Event Description', 'H6 Health Effect Impact Code', and 'H6 Health Effect Clinical Code'.
 2.  Look for explicit keywords and descriptions indicating injury, such as "bleeding", "laceration", "complication", "adverse event", "extended surgery", or "unintended tissue damage".
-If there is no indication of patient injury, choose 'none'.
-Row JSON:
-{row_json}"""
+If there is no indication of patient injury, choose 'none'."""
 
-def prompt_summary(row_json: str, ans_breakage: str, ans_ceramic: str, ans_detected: str, ans_harm: str) -> str:
-    return f"""Write a concise English summary (2–4 sentences) JUSTIFYING the four answers.
+SYSTEM_PROMPT_SUMMARY = SYSTEM_PROMPT + """
+Write a concise English summary (2–4 sentences) JUSTIFYING the four given answers.
 Requirements:
 - Quote short, verbatim snippets from the row using double quotes, and after each quote add a source marker like [Column=Event Description].
 - Explicitly mention WHICH column each piece of evidence was found in.
 - When relevant fields are empty/unknown, state 'not specified'.
 - Focus only on evidence supporting: breakage, ceramic tip relation, detection timing, patient harm.
-- Output plain text (no markdown).
+- Output plain text (no markdown)."""
+
+# Key specification of the combined JSON answer (shared by the single-row and the batch prompt)
+COMBINED_KEYS_SPEC = f"""- "breakage": Is the issue related to breakage? Exactly "Yes" or "No". Consider fields such as 'H6 Medical Device Problem Code', 'Event Description', 'Evaluation Result', 'Investigation Conclusion' and related text.
+- "ceramic": Is the issue related to the ceramic tip? Exactly "Yes" or "No". Search for explicit mentions and close synonyms like ceramic tip, ceramic beak, tip, beak, or phrasing indicating ceramic-part damage.
+- "detected": WHEN was the issue detected? Exactly ONE of: {" | ".join(DETECTED_LABELS)}
+  Hints: before the operation -> During Inspection; intraoperative -> During Operation; found during cleaning/sterilization -> During Reprocessing; service scenarios -> During Service Activities; later follow-up of the patient -> During follow-up Examination of Patient.
+- "harm": Type of patient harm? Exactly ONE of: {" | ".join(PATIENT_HARM_LABELS)}
+  Actively search 'Event Description', 'H6 Health Effect Impact Code' and 'H6 Health Effect Clinical Code' for injury such as "bleeding", "laceration", "complication", "adverse event", "extended surgery", or "unintended tissue damage". If there is no indication of patient injury, choose 'none'.
+- "summary": Concise English summary (2–4 sentences) JUSTIFYING the four answers. Quote short, verbatim snippets from the row in double quotes, each followed by a source marker like [Column=Event Description]. When relevant fields are empty/unknown, state 'not specified'. Plain text (no markdown)."""
+
+SYSTEM_PROMPT_COMBINED = SYSTEM_PROMPT + f"""
+Task: Answer four classification questions about the row content and justify them in a summary.
+Respond with ONE JSON object with exactly these keys and nothing else:
+{{"breakage": ..., "ceramic": ..., "detected": ..., "harm": ..., "summary": ...}}
+{COMBINED_KEYS_SPEC}"""
+
+SYSTEM_PROMPT_COMBINED_BATCH = SYSTEM_PROMPT + f"""
+Task: For EACH of the given rows, answer four classification questions and justify them in a summary.
+Judge every row on its own content only.
+Respond with ONE JSON object {{"rows": [...]}} whose list holds one object per row, in row order, each with exactly these keys:
+{{"row_index": ..., "breakage": ..., "ceramic": ..., "detected": ..., "harm": ..., "summary": ...}}
+- "row_index": the row_index of the row being answered.
+{COMBINED_KEYS_SPEC}"""
+
+def prompt_row(row_json: str) -> str:
+    """User message for all single-row questions: only the row, at the very end of the prompt."""
+    return f"""ROW:
+{row_json}
+ANSWER:"""
+
+def prompt_summary(row_json: str, ans_breakage: str, ans_ceramic: str, ans_detected: str, ans_harm: str) -> str:
+    return f"""ROW:
+{row_json}
 Given answers: breakage={ans_breakage}; ceramic_tip={ans_ceramic}; detected={ans_detected}; harm={ans_harm}.
-Row JSON:
-{row_json}"""
+ANSWER:"""
+
+def prompt_combined_batch(rows_json: List[str]) -> str:
+    rows_block = ",\n".join(f'{{"row_index": {i}, "row": {row_json}}}' for i, row_json in enumerate(rows_json))
+    return f"""ROWS ({len(rows_json)}):
+[{rows_block}]
+ANSWER:"""
+
+# Columns each question actually needs; only these are sent to the model (fewer input tokens)
+FIELDS_FOR = {
+    "breakage": ["H6 Medical Device Problem Code", "Event Description", "Evaluation Result", "Investigation Conclusion"],
+    "ceramic": ["H6 Medical Device Problem Code", "Event Description", "Evaluation Result", "Investigation Conclusion"],
+    "detected": ["Event Description", "Evaluation Result", "Investigation Conclusion"],
+    "harm": ["Event Description", "H6 Health Effect Impact Code", "H6 Health Effect Clinical Code"],
+}
+# Union of all question fields (combined call, summary, semantic row cache)
+RELEVANT_FIELDS = tuple(dict.fromkeys(f for fields in FIELDS_FOR.values() for f in fields))
+
+_PREFILTER_RE = re.compile(r"\b(?:" + "|".join(re.escape(k) for k in PREFILTER_KEYWORDS) + ")", re.IGNORECASE)
+# New column values of a pre-filtered row ("detected" is not determinable without the model, no summary)
+PREFILTER_COLUMNS = {
+    "Issue related to breakage?": "No",
+    "Issue related to ceramic tip?": "No",
+    "When was the issue detected?": "",
+    "Type of Patient-Harm?": "none",
+    "Summary": "",
+}
+
+# Classifier questions: key in the combined JSON answer -> (single-question system prompt, allowed labels, NUM_PREDICT_MAP kind)
+CLASSIFIER_QUESTIONS = {
+    "breakage": (SYSTEM_PROMPT_BREAKAGE, STRICT_YESNO, "yesno"),
+    "ceramic": (SYSTEM_PROMPT_CERAMIC, STRICT_YESNO, "yesno"),
+    "detected": (SYSTEM_PROMPT_DETECTED, DETECTED_LABELS, "label"),
+    "harm": (SYSTEM_PROMPT_HARM, PATIENT_HARM_LABELS, "label"),
+}
 
 # -----------------------------
 # Helper Functions
 # -----------------------------
 
-def reorder_row(row: Dict[str, Any], headers_list: List[str]) -> OrderedDict:
-    """Return row as OrderedDict with keys exactly in headers_list order."""
-    return OrderedDict((h, row.get(h, "")) for h in headers_list)
+def row_json_for(row: Dict[str, Any], fields) -> str:
+    """
+    Compact JSON of the row restricted to `fields` (missing ones as "").
+    If the row has none of these columns (other export layout), the full row is sent instead.
+    """
+    if any(f in row for f in fields):
+        row = {f: row.get(f, "") for f in fields}
+    if orjson:
+        return orjson.dumps(row).decode("utf-8")
+    return json.dumps(row, ensure_ascii=False, separators=(",", ":"))
+
+_json_loads = orjson.loads if orjson else json.loads
+_JSON_DECODE_ERRORS = (ValueError, TypeError)  # json.JSONDecodeError and orjson.JSONDecodeError are ValueErrors
+_BRACE_RE = re.compile(r"\{.*\}", re.DOTALL)  # first "{" ... last "}"
+_RAW_DECODER = json.JSONDecoder()
+
+def extract_json_snippet(text: Optional[str]) -> Any:
+    """
+    Parses the JSON value in a model output; returns None if there is none.
+    Clean JSON (the normal case with format="json") is parsed in one C-level call; only for
+    outputs with surrounding text the first-to-last-brace span and finally each "{" position are tried.
+    """
+    if not text:
+        return None
+    text = text.strip()
+    try:
+        return _json_loads(text)
+    except _JSON_DECODE_ERRORS:
+        pass
+    m = _BRACE_RE.search(text)
+    if m is None:
+        return None
+    try:
+        return _json_loads(m.group(0))
+    except _JSON_DECODE_ERRORS:
+        pass
+    # Last resort: first complete object starting at any "{" (e.g. trailing text containing braces)
+    pos = text.find("{")
+    while pos != -1:
+        try:
+            return _RAW_DECODER.raw_decode(text, pos)[0]
+        except ValueError:
+            pos = text.find("{", pos + 1)
+    return None
+
+def reorder_row(row: Dict[str, Any], headers_list: List[str]) -> Dict[str, Any]:
+    """Return row as dict (insertion-ordered) with keys exactly in headers_list order."""
+    return {h: row.get(h, "") for h in headers_list}
+
+# Lowercased label tables, computed once: label set -> ((lowercase, original casing), ...)
+_LOWER_LABELS: Dict[Tuple[str, ...], Tuple[Tuple[str, str], ...]] = {
+    labels: tuple((label.lower(), label) for label in labels)
+    for labels in (STRICT_YESNO, DETECTED_LABELS, PATIENT_HARM_LABELS)
+}
 
 def _parse_flexible_answer(raw_answer: Optional[str], valid_labels: Tuple[str, ...]) -> Optional[str]:
     """Finds the first valid label in a raw string, case-insensitive."""
     if not raw_answer:
         return None
+    raw_answer = raw_answer.strip()
     if raw_answer in valid_labels:
         return raw_answer
+    lower_labels = _LOWER_LABELS.get(valid_labels)
+    if lower_labels is None:  # label set not known in advance
+        lower_labels = tuple((label.lower(), label) for label in valid_labels)
     lower_answer = raw_answer.lower()
-    for label in valid_labels:
-        if label.lower() in lower_answer:
+    for lower_label, label in lower_labels:
+        if lower_label in lower_answer:
             return label  # original casing
     return None
 
-def _ask_and_validate_question(
-    prompt_func, *args,
+class _TokenBucket:
+    """Minimal async token bucket (fallback for aiolimiter.AsyncLimiter): max_rate requests per time_period, bursts up to max_rate."""
+
+    def __init__(self, max_rate: float, time_period: float = 60.0):
+        self.max_rate = max(1.0, max_rate)  # capacity below one token would never allow a request
+        self._refill_per_sec = max_rate / time_period
+        self._tokens = float(max_rate)
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Waits only if the bucket is empty, i.e. when the request would exceed the rate."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.max_rate, self._tokens + (now - self._last) * self._refill_per_sec)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self._refill_per_sec)
+
+async def _chat(
+    messages: List[Dict[str, str]], num_predict: int,
+    response_format: Optional[str] = None, stop: Optional[List[str]] = None,
+    accept: Optional[Callable[[str], bool]] = None,
+) -> Optional[str]:
+    """
+    Runs one Ollama chat request (bounded by the request semaphore); answers are served from the cache if possible.
+    A new answer is only cached if accept(answer) is true (i.e. it parses), so unusable answers are asked again next run.
+    """
+    kwargs = dict(
+        model=cli_args.model, messages=messages, host=cli_args.host,
+        temperature=cli_args.temperature, num_predict=num_predict,
+        timeout=cli_args.timeout, response_format=response_format, stop=stop,
+    )
+    cache_key = None
+    if _cache is not None:
+        cache_key = ResponseCache.make_key(_build_chat_payload(
+            kwargs["model"], messages, kwargs["temperature"], num_predict, response_format, stop
+        ), _model_digest)
+        cached = _cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    if _rate_limiter is not None:
+        await _rate_limiter.acquire()  # before taking a slot, so throttled requests do not block one
+    async with _request_slots:
+        if cli_args.sync:
+            # Blocking requests call in a worker thread, so several requests can still be in flight
+            raw_answer = await asyncio.to_thread(call_ollama_chat, **kwargs)
+        else:
+            raw_answer = await call_ollama_chat_async(**kwargs)
+
+    if cache_key is not None and raw_answer and (accept is None or accept(raw_answer)):
+        _cache.put(cache_key, raw_answer)
+    return raw_answer
+
+async def _ask(
+    system_prompt: str, question_text: str,
     valid_labels: Optional[Tuple[str, ...]] = None,
-    is_summary: bool = False
+    kind: str = "label"
 ) -> Tuple[str, bool]:
-    """Helper to ask a question, parse the answer, and return value and validity."""
-    question_text = prompt_func(*args)
-    messages = [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": question_text}]
-    raw_answer = call_ollama_chat(
-        model=cli_args.model, messages=messages, host=cli_args.host,
-        temperature=cli_args.temperature, num_predict=cli_args.num_predict, timeout=cli_args.timeout
+    """
+    Asks a single question, parses the answer, and returns value and validity.
+    kind ("yesno", "label", "summary") selects the token budget from NUM_PREDICT_MAP; classifiers stop at the first newline.
+    """
+    messages = [{"role": "system", "content": system_prompt}, {"role": "user", "content": question_text}]
+    is_summary = kind == "summary"
+    raw_answer = await _chat(
+        messages, num_predict=cli_args.num_predict or NUM_PREDICT_MAP[kind],
+        stop=None if is_summary else CLASSIFIER_STOP,
+        accept=None if is_summary else (lambda answer: _parse_flexible_answer(answer, valid_labels) is not None),
     )
 
     if raw_answer is None:  # API call failed
@@ -441,31 +1032,373 @@ def _ask_and_validate_question(
         logger.warning(f"Could not parse valid label from model output: '{raw_answer}'")
         return raw_answer, False
 
+async def _ask_combined(row_json: str) -> Optional[Dict[str, Tuple[str, bool]]]:
+    """
+    Asks all four classifications plus the summary in one JSON-formatted call.
+    Returns {key: (value, valid)} for every key, an empty dict if the output is not usable JSON,
+    or None if the request itself failed (server down, timeout).
+    """
+    messages = [{"role": "system", "content": SYSTEM_PROMPT_COMBINED}, {"role": "user", "content": prompt_row(row_json)}]
+    raw_answer = await _chat(
+        messages, num_predict=cli_args.num_predict_combined, response_format="json",
+        accept=lambda answer: isinstance(extract_json_snippet(answer), dict),
+    )
+    if raw_answer is None:  # API call failed
+        return None
+    data = extract_json_snippet(raw_answer)
+    if data is None:
+        logger.warning(f"Could not parse JSON from combined model output: '{raw_answer}'")
+        return {}
+    if not isinstance(data, dict):
+        logger.warning(f"Combined model output is not a JSON object: '{raw_answer}'")
+        return {}
+    return _answers_from_json(data)
+
+def _answers_from_json(data: Dict[str, Any]) -> Dict[str, Tuple[str, bool]]:
+    """Validates one combined answer object -> {key: (value, valid)} for all classifier keys + summary."""
+    answers: Dict[str, Tuple[str, bool]] = {}
+    for key, (_, valid_labels, _) in CLASSIFIER_QUESTIONS.items():
+        value = data.get(key)
+        value = value.strip() if isinstance(value, str) else ""
+        parsed_answer = _parse_flexible_answer(value, valid_labels)
+        answers[key] = (parsed_answer, True) if parsed_answer else (value, False)
+    summary_text = data.get("summary")
+    summary_text = summary_text.strip() if isinstance(summary_text, str) else ""
+    answers["summary"] = (summary_text, bool(summary_text))
+    return answers
+
+async def _ask_combined_batch(rows_json: List[str]) -> List[Dict[str, Tuple[str, bool]]]:
+    """
+    Asks the combined question for several rows in one call (row-marshaling).
+    Returns one answers dict per row (same order); rows without a usable answer get an empty dict.
+    """
+    messages = [{"role": "system", "content": SYSTEM_PROMPT_COMBINED_BATCH}, {"role": "user", "content": prompt_combined_batch(rows_json)}]
+    raw_answer = await _chat(
+        messages, num_predict=cli_args.num_predict_combined * len(rows_json), response_format="json",
+        accept=lambda answer: isinstance(_batch_items(extract_json_snippet(answer)), list),
+    )
+    results: List[Dict[str, Tuple[str, bool]]] = [{} for _ in rows_json]
+    if raw_answer is None:  # API call failed
+        return results
+    data = extract_json_snippet(raw_answer)
+    if data is None:
+        logger.warning(f"Could not parse JSON from batch model output: '{raw_answer}'")
+        return results
+    items = _batch_items(data)
+    if not isinstance(items, list):
+        logger.warning(f"Batch model output has no 'rows' list: '{raw_answer}'")
+        return results
+
+    for pos, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        row_index = item.get("row_index", pos)
+        if isinstance(row_index, int) and 0 <= row_index < len(results) and not results[row_index]:
+            results[row_index] = _answers_from_json(item)
+    return results
+
+def _batch_items(data: Any) -> Any:
+    """Per-row answer list of a parsed batch answer ({"rows": [...]} or a bare list)."""
+    return data.get("rows") if isinstance(data, dict) else data
+
+def _dedupe_key(row_json: str) -> bytes:
+    """Key for identical rows: hash of the compact RELEVANT_FIELDS view (fixed column order)."""
+    return hashlib.blake2b(row_json.encode("utf-8"), digest_size=16).digest()
+
+def _claim_row(row_json: str) -> Tuple[asyncio.Future, bool]:
+    """Future for the answers of this row content -> (future, True if this row is the first and must answer it)."""
+    dedupe_key = _dedupe_key(row_json)
+    first = _dedupe_futures.get(dedupe_key)
+    if first is not None:
+        return first, False
+    first = _dedupe_futures[dedupe_key] = asyncio.get_running_loop().create_future()
+    return first, True
+
+async def _final_answers(
+    idx: int, row: Dict[str, Any], row_json: str, answers: Optional[Dict[str, Tuple[str, bool]]]
+) -> Dict[str, Tuple[str, bool]]:
+    """
+    Final answers for a row: semantic cache, one combined call (unless answers from a batch call
+    are passed in), single questions only for what it could not answer, then the summary.
+    row_json is the compact RELEVANT_FIELDS view of the row; single questions get their FIELDS_FOR subset.
+    """
+    embedding = None
+    if _semantic_cache is not None:
+        row_text = SemanticRowCache.row_text(row)
+        if row_text:
+            embedding = await asyncio.to_thread(_semantic_cache.embed, row_text)
+            cached_answers = _semantic_cache.lookup(embedding)
+            if cached_answers is not None:
+                logger.info(f"Row {idx}: semantic cache hit")
+                answers, embedding = cached_answers, None
+
+    if answers is None:
+        answers = await _ask_combined(row_json)
+        if answers is None:
+            # Request failed: single questions would only hit the same server (up to --timeout each)
+            logger.warning(f"Row {idx}: combined request failed, no single-question fallback")
+            return {key: ("", False) for key in (*CLASSIFIER_QUESTIONS, "summary")}
+    fallback_keys = [key for key in CLASSIFIER_QUESTIONS if not answers.get(key, ("", False))[1]]
+    if fallback_keys:
+        logger.info(f"Row {idx}: fallback to single questions for {', '.join(fallback_keys)}")
+        results = await asyncio.gather(*(
+            _ask(
+                CLASSIFIER_QUESTIONS[key][0], prompt_row(row_json_for(row, FIELDS_FOR[key])),
+                valid_labels=CLASSIFIER_QUESTIONS[key][1], kind=CLASSIFIER_QUESTIONS[key][2],
+            )
+            for key in fallback_keys
+        ))
+        answers.update(zip(fallback_keys, results))
+
+    # Summary must justify the final answers: re-ask if missing or if answers changed in the fallback
+    if fallback_keys or not answers.get("summary", ("", False))[1]:
+        # Pass (even invalid) answers to summary to give it context
+        answers["summary"] = await _ask(
+            SYSTEM_PROMPT_SUMMARY,
+            prompt_summary(row_json, *(answers[key][0] for key in ("breakage", "ceramic", "detected", "harm"))),
+            kind="summary",
+        )
+
+    if embedding is not None and all(valid for _, valid in answers.values()):
+        _semantic_cache.add(embedding, answers)
+    return answers
+
+async def _enrich_row(
+    idx: int, row: Dict[str, Any], row_json: str, answers: Optional[Dict[str, Tuple[str, bool]]] = None,
+    claim: Optional[Tuple[asyncio.Future, bool]] = None,
+) -> Dict[str, Any]:
+    """
+    Enriches a single row (see _final_answers). Rows with the same relevant content as an earlier
+    row are not asked again: they wait for the answers of the first one (claim from _claim_row,
+    taken here unless the caller already took it).
+    """
+    row_t0 = time.perf_counter()
+    logger.info(f"Row {idx} start")
+
+    if answers is None and _is_prefiltered(row):
+        # Own status, not a failure: the row was deliberately not sent to the model
+        out_row = dict(row)
+        out_row.update(PREFILTER_COLUMNS)
+        logger.info(f"Row {idx}: prefiltered (no keywords, not sent to the model)")
+        logger.info(f"Row {idx} end | duration_sec={time.perf_counter() - row_t0:.3f}")
+        return out_row
+
+    first, is_first = claim or _claim_row(row_json)
+    if not is_first:
+        logger.info(f"Row {idx}: duplicate of an earlier row, reusing its answers")
+        answers = dict(await asyncio.shield(first))
+    else:
+        try:
+            answers = await _final_answers(idx, row, row_json, answers)
+        except BaseException:
+            first.cancel()  # Duplicates waiting for this row abort too
+            raise
+        first.set_result(answers)
+
+    ans_breakage, valid_breakage = answers["breakage"]
+    ans_ceramic, valid_ceramic = answers["ceramic"]
+    ans_detected, valid_detected = answers["detected"]
+    ans_harm, valid_harm = answers["harm"]
+    summary_text, valid_summary = answers["summary"]
+
+    out_row = dict(row)
+    out_row["Issue related to breakage?"] = ans_breakage if valid_breakage else ""
+    out_row["Issue related to ceramic tip?"] = ans_ceramic if valid_ceramic else ""
+    out_row["When was the issue detected?"] = ans_detected if valid_detected else ""
+    out_row["Type of Patient-Harm?"] = ans_harm if valid_harm else ""
+    out_row["Summary"] = summary_text if valid_summary else ""
+
+    status_parts = [
+        f"breakage={ans_breakage if valid_breakage else 'fail'}",
+        f"ceramic={ans_ceramic if valid_ceramic else 'fail'}",
+        f"detected={ans_detected if valid_detected else 'fail'}",
+        f"harm={ans_harm if valid_harm else 'fail'}",
+        f"summary={'ok' if valid_summary else 'fail'}",
+    ]
+    all_valid = all([valid_breakage, valid_ceramic, valid_detected, valid_harm, valid_summary])
+    logger.log(logging.INFO if all_valid else logging.WARNING, f"Row {idx}: " + ", ".join(status_parts))
+
+    row_dt = time.perf_counter() - row_t0
+    logger.info(f"Row {idx} end | duration_sec={row_dt:.3f}")
+    return out_row
+
+def _is_prefiltered(row: Dict[str, Any]) -> bool:
+    """
+    True if the row can be answered without the model (no keyword in its relevant columns).
+    Matches the raw cell texts, not row_json: JSON escapes like "\\n" would break the word boundaries.
+    """
+    if not cli_args.prefilter:
+        return False
+    fields = RELEVANT_FIELDS if any(f in row for f in RELEVANT_FIELDS) else row  # same fallback as row_json_for
+    return _PREFILTER_RE.search("\n".join(str(row.get(f) or "") for f in fields)) is None
+
+async def process_row(idx: int, row: Dict[str, Any], row_json: str) -> List[Dict[str, Any]]:
+    """Processes one row (row_json already serialized by the producer)."""
+    return [await _enrich_row(idx, row, row_json)]
+
+async def process_batch(start_idx: int, batch: List[Dict[str, Any]], rows_json: List[str]) -> List[Dict[str, Any]]:
+    """
+    Processes --batch_size rows with one batch call; pre-filtered and duplicate rows are left out of it,
+    rows it could not answer take the single-row path.
+    """
+    # Claim before the batch call, so jobs running meanwhile wait for these rows instead of asking again
+    claims = [None if _is_prefiltered(row) else _claim_row(row_json) for row, row_json in zip(batch, rows_json)]
+    to_ask = [pos for pos, claim in enumerate(claims) if claim is not None and claim[1]]
+    batch_answers: List[Dict[str, Tuple[str, bool]]] = [{} for _ in batch]
+    if to_ask:
+        try:
+            for pos, answers in zip(to_ask, await _ask_combined_batch([rows_json[pos] for pos in to_ask])):
+                batch_answers[pos] = answers
+        except BaseException:
+            for pos in to_ask:
+                claims[pos][0].cancel()
+            raise
+        n_missing = sum(1 for pos in to_ask if not batch_answers[pos])
+        if n_missing:
+            logger.info(f"Rows {start_idx}-{start_idx + len(batch) - 1}: {n_missing} of {len(to_ask)} without batch answer")
+    out_rows = await asyncio.gather(*(
+        _enrich_row(idx, row, row_json, answers or None, claim)
+        for idx, row, row_json, answers, claim in zip(range(start_idx, start_idx + len(batch)), batch, rows_json, batch_answers, claims)
+    ))
+    return list(out_rows)
+
+def _next_job(rows_iter: Iterator[Dict[str, Any]], k: int) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Reads the next k rows and serializes them (runs in a worker thread, see _produce_jobs)."""
+    batch = list(itertools.islice(rows_iter, k))
+    return batch, [row_json_for(row, RELEVANT_FIELDS) for row in batch]
+
+async def _produce_jobs(rows_iter: Iterator[Dict[str, Any]], queue: asyncio.Queue, n_consumers: int) -> None:
+    """
+    Producer: reads (and for --stream parses) rows and serializes their row_json in a worker thread,
+    so this CPU work overlaps with the LLM calls of the consumers. One job = one row or one batch.
+    """
+    loop = asyncio.get_running_loop()
+    job_no, idx = 0, 1
+    while True:
+        batch, rows_json = await loop.run_in_executor(None, _next_job, rows_iter, cli_args.batch_size)
+        if not batch:
+            break
+        await queue.put((job_no, idx, batch, rows_json))
+        job_no += 1
+        idx += len(batch)
+    for _ in range(n_consumers):
+        await queue.put(None)  # one stop marker per consumer
+
+class _OrderedEmitter:
+    """Passes the rows of finished jobs to emit in job order; jobs finished ahead of an older one wait here."""
+
+    def __init__(self, emit: Callable[[Dict[str, Any]], None]):
+        self._emit = emit
+        self._next_job = 0
+        self._pending: Dict[int, List[Dict[str, Any]]] = {}
+
+    def done(self, job_no: int, out_rows: List[Dict[str, Any]]) -> None:
+        self._pending[job_no] = out_rows
+        while self._next_job in self._pending:
+            for out_row in self._pending.pop(self._next_job):
+                self._emit(out_row)
+            self._next_job += 1
+
+async def _consume_jobs(queue: asyncio.Queue, emitter: _OrderedEmitter) -> None:
+    """Consumer: processes jobs from the queue until it receives the stop marker."""
+    while True:
+        job = await queue.get()
+        if job is None:
+            return
+        job_no, idx, batch, rows_json = job
+        if cli_args.batch_size > 1:
+            emitter.done(job_no, await process_batch(idx, batch, rows_json))
+        else:
+            emitter.done(job_no, await process_row(idx, batch[0], rows_json[0]))
+
+async def process_rows(rows: Iterable[Dict[str, Any]], emit: Callable[[Dict[str, Any]], None]) -> None:
+    """
+    Processes all rows with --parallel consumers fed by one serializing producer; emit gets every enriched
+    row in input order as soon as it and all rows before it are done (e.g. RowsWriter.write).
+    The queue holds at most 2 x --parallel prepared jobs; besides those, only the results of jobs that
+    finished ahead of the oldest running one are held, so a streamed input is never fully buffered.
+    """
+    global _request_slots, _rate_limiter, _dedupe_futures
+    # Queue/Semaphore erst im laufenden Loop anlegen (Python 3.9 bindet sie sonst an einen falschen Loop)
+    _request_slots = asyncio.Semaphore(cli_args.parallel)
+    if cli_args.qpm > 0:
+        # Below 1 qpm: one request per 60/qpm seconds (AsyncLimiter rejects max_rate < 1)
+        max_rate, time_period = (cli_args.qpm, 60) if cli_args.qpm >= 1 else (1, 60 / cli_args.qpm)
+        _rate_limiter = (AsyncLimiter or _TokenBucket)(max_rate, time_period)
+    _dedupe_futures = {}
+    queue: asyncio.Queue = asyncio.Queue(maxsize=2 * cli_args.parallel)
+    emitter = _OrderedEmitter(emit)
+    producer = asyncio.ensure_future(_produce_jobs(iter(rows), queue, cli_args.parallel))
+    consumers = [asyncio.ensure_future(_consume_jobs(queue, emitter)) for _ in range(cli_args.parallel)]
+    try:
+        await asyncio.gather(producer, *consumers)
+    finally:
+        for task in (producer, *consumers):
+            task.cancel()
+        await _close_async_client()
+
 # -----------------------------
 # Main processing
 # -----------------------------
 
 cli_args: argparse.Namespace = None  # Global placeholder for command-line arguments
+_request_slots: asyncio.Semaphore = None  # Limits concurrent Ollama requests (set in process_rows)
+_rate_limiter = None  # AsyncLimiter/_TokenBucket for --qpm (set in process_rows); None = unlimited
+_dedupe_futures: Dict[bytes, asyncio.Future] = {}  # _dedupe_key -> answers of the first row with that content
+
+CLI_EPILOG = """\
+Ollama server environment (set before starting 'ollama serve'):
+  OLLAMA_NUM_PARALLEL       max. parallel requests per loaded model; --parallel should match it
+                            (default for --parallel is taken from this variable if set)
+  OLLAMA_MAX_LOADED_MODELS  max. models kept loaded at the same time
+"""
 
 def main() -> None:
-    global cli_args
-    ap = argparse.ArgumentParser(description="Enrich JSON rows with model-derived fields using Ollama/Mistral.")
+    global cli_args, _cache, _semantic_cache, _model_digest
+    ap = argparse.ArgumentParser(
+        description="Enrich JSON rows with model-derived fields using Ollama/Mistral.",
+        epilog=CLI_EPILOG,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
     ap.add_argument("--input", "-i", type=Path, default=Path(DEFAULT_INPUT_PATH), help="Path to input JSON file")
     ap.add_argument("--out", "-o", type=Path, default=Path(DEFAULT_OUTPUT_PATH), help="Path to output JSON")
     ap.add_argument("--model", "-m", type=str, default=OLLAMA_MODEL, help="Ollama model name")
     ap.add_argument("--host", type=str, default=OLLAMA_HOST, help="Ollama host, e.g. http://localhost:11434")
     ap.add_argument("--temperature", type=float, default=TEMPERATURE, help="Sampling temperature (keep low)")
-    ap.add_argument("--num_predict", type=int, default=NUM_PREDICT, help="Max tokens per answer")
+    ap.add_argument("--num_predict", type=int, default=None, help="Max tokens per single answer (default: per question kind, see NUM_PREDICT_MAP)")
+    ap.add_argument("--num_predict_combined", type=int, default=NUM_PREDICT_COMBINED, help="Max tokens for the combined JSON answer per row")
     ap.add_argument("--timeout", type=float, default=TIMEOUT_SEC, help="HTTP timeout seconds")
-    ap.add_argument("--delay", type=float, default=REQUEST_DELAY_SEC, help="Optional delay between processed rows")
+    ap.add_argument("--delay", type=float, default=None, help="Deprecated and ignored; use --qpm to limit the request rate")
+    ap.add_argument("--qpm", type=float, default=MAX_QPM, help="Max. Ollama requests per minute, bursts allowed (0 = unlimited; cache hits are not counted)")
+    ap.add_argument("--parallel", type=int, default=int(os.environ.get("OLLAMA_NUM_PARALLEL", MAX_PARALLEL)),
+                    help="Max. concurrent rows/requests (default: $OLLAMA_NUM_PARALLEL or %(default)s)")
+    ap.add_argument("--batch_size", type=int, default=BATCH_SIZE,
+                    help="Rows per combined LLM call (1 = one call per row); tune by measuring, gains shrink for long rows")
+    ap.add_argument("--prefilter", action="store_true",
+                    help="Answer rows without any (English) breakage/ceramic/harm keyword without the model")
+    ap.add_argument("--pretty", action="store_true", help="Write indented output JSON (builds the whole document in memory)")
+    ap.add_argument("--stream", action="store_true", help="Stream the input rows with ijson instead of loading the whole file")
+    ap.add_argument("--sync", action="store_true", help="Use the blocking requests client (in worker threads) instead of httpx")
+    ap.add_argument("--cache", type=Path, default=Path(DEFAULT_CACHE_PATH), help="SQLite file for cached LLM answers")
+    ap.add_argument("--no-cache", dest="no_cache", action="store_true", help="Disable the persistent answer cache")
+    ap.add_argument("--semantic-cache", dest="semantic_cache", action="store_true",
+                    help="Reuse answers of semantically near-identical rows (needs sentence-transformers + faiss)")
+    ap.add_argument("--semantic-threshold", dest="semantic_threshold", type=float, default=SEMANTIC_THRESHOLD,
+                    help="Min. cosine similarity for a semantic cache hit")
     cli_args = ap.parse_args()
+    if cli_args.delay is not None:
+        logger.warning("--delay is deprecated and ignored; use --qpm to limit the request rate.")
+    if not cli_args.sync and httpx is None:
+        logger.info("httpx nicht verfügbar – nutze requests (wie --sync).")
+        cli_args.sync = True
 
     t0 = time.perf_counter()
 
     # Modell- und Laufkonfiguration loggen
     logger.info(f"Run started | input='{cli_args.input}' | output='{cli_args.out}'")
-    logger.info(f"Model: {cli_args.model} | Host: {cli_args.host} | temperature={cli_args.temperature} | num_predict={cli_args.num_predict} | timeout={cli_args.timeout} | delay={cli_args.delay}")
+    logger.info(f"Model: {cli_args.model} | Host: {cli_args.host} | temperature={cli_args.temperature} | num_predict={cli_args.num_predict or NUM_PREDICT_MAP} | num_predict_combined={cli_args.num_predict_combined} | timeout={cli_args.timeout} | qpm={cli_args.qpm or 'unlimited'} | parallel={cli_args.parallel} | batch_size={cli_args.batch_size} | prefilter={cli_args.prefilter} | client={'requests' if cli_args.sync else ('httpx/http2' if h2 else 'httpx')}")
     model_info = fetch_model_info(cli_args.host, cli_args.model)
+    _model_digest = model_info.get("digest")
     if model_info:
         logger.info("Model info: " + ", ".join(f"{k}={v}" for k, v in model_info.items()))
     else:
@@ -479,8 +1412,14 @@ def main() -> None:
     perf_mon.start()
 
     # --- Daten laden
+    if cli_args.stream and ijson is None:
+        logger.warning("ijson nicht verfügbar – Input wird komplett geladen (ohne --stream).")
+        cli_args.stream = False
     try:
-        rows, headers, original_data = load_rows_from_json(cli_args.input)
+        if cli_args.stream:
+            rows, headers, original_data = stream_rows_from_json(cli_args.input)
+        else:
+            rows, headers, original_data = load_rows_from_json(cli_args.input)
     except Exception as e:
         logger.error(f"Failed to load or parse input file: {e}")
         try:
@@ -490,51 +1429,76 @@ def main() -> None:
             pass
         sys.exit(1)
 
-    logger.info(f"Loaded {len(rows)} rows to process.")
-    enriched_rows: List[Dict[str, Any]] = []
+    if cli_args.stream:
+        logger.info("Streaming rows from input.")
+    else:
+        logger.info(f"Loaded {len(rows)} rows to process.")
+    cli_args.parallel = max(1, cli_args.parallel)
+    cli_args.batch_size = max(1, cli_args.batch_size)
+
+    # --- Caches öffnen (Fehler hier sind nicht fatal: dann ohne Cache weiter)
+    if not cli_args.no_cache:
+        try:
+            _cache = ResponseCache(cli_args.cache)
+            logger.info(f"LLM cache: {cli_args.cache}")
+        except Exception as e:
+            logger.warning(f"LLM cache nicht verfügbar ({cli_args.cache}): {e}")
+    if cli_args.semantic_cache:
+        if SentenceTransformer is None:
+            logger.warning("Semantic cache angefordert, aber sentence-transformers/faiss/numpy nicht verfügbar.")
+        else:
+            try:
+                _semantic_cache = SemanticRowCache(
+                    cli_args.cache, f"{cli_args.model}@{_model_digest}", threshold=cli_args.semantic_threshold
+                )
+                logger.info(f"Semantic row cache: model={SEMANTIC_MODEL} threshold={cli_args.semantic_threshold}")
+            except Exception as e:
+                logger.warning(f"Semantic cache nicht verfügbar: {e}")
+
+    # --- Preserve original outer structure; rows are written while they are processed ---
+    output_obj: Any
+    if isinstance(original_data, dict) and "sheets" in original_data:
+        output_obj = original_data
+        first_sheet_key = next(iter(output_obj["sheets"].keys()))
+        table0 = output_obj["sheets"][first_sheet_key]["excel_tables"][0]
+
+        headers_list = table0.get("headers") or (list(headers) if headers else [])
+        for col in NEW_COLUMNS:
+            if col not in headers_list:
+                headers_list.append(col)
+        table0["headers"] = headers_list
+        rows_parent: Optional[Dict[str, Any]] = table0
+        out_headers: Optional[List[str]] = headers_list
+
+    elif isinstance(original_data, list):
+        # BUG FIX: Use the original headers, not inferred ones from the enriched row
+        out_headers = (headers or []) + [col for col in NEW_COLUMNS if col not in (headers or [])]
+        output_obj, rows_parent = None, None
+    else:
+        output_obj, rows_parent, out_headers = None, None, None  # Fallback: rows as enriched
 
-    # --- Verarbeitung
     try:
-        for idx, row in enumerate(rows, start=1):
-            row_t0 = time.perf_counter()
-            logger.info(f"Row {idx} start")
-            row_json = json.dumps(row, ensure_ascii=False, indent=2)
-
-            ans_breakage, valid_breakage = _ask_and_validate_question(prompt_yesno_breakage, row_json, valid_labels=STRICT_YESNO)
-            ans_ceramic, valid_ceramic = _ask_and_validate_question(prompt_yesno_ceramic, row_json, valid_labels=STRICT_YESNO)
-            ans_detected, valid_detected = _ask_and_validate_question(prompt_detected_when, row_json, valid_labels=DETECTED_LABELS)
-            ans_harm, valid_harm = _ask_and_validate_question(prompt_patient_harm, row_json, valid_labels=PATIENT_HARM_LABELS)
-
-            # Pass (even invalid) answers to summary to give it context
-            summary_text, valid_summary = _ask_and_validate_question(
-                prompt_summary, row_json, ans_breakage, ans_ceramic, ans_detected, ans_harm, is_summary=True
-            )
+        writer = RowsWriter(Path(cli_args.out), output_obj, rows_parent, pretty=cli_args.pretty)
+    except Exception as e:
+        logger.error(f"Failed to write output file: {e}")
+        _close_caches()
+        try:
+            perf_mon.stop()
+            perf_mon.join(timeout=3.0)
+        except Exception:
+            pass
+        sys.exit(1)
 
-            out_row = dict(row)
-            out_row["Issue related to breakage?"] = ans_breakage if valid_breakage else ""
-            out_row["Issue related to ceramic tip?"] = ans_ceramic if valid_ceramic else ""
-            out_row["When was the issue detected?"] = ans_detected if valid_detected else ""
-            out_row["Type of Patient-Harm?"] = ans_harm if valid_harm else ""
-            out_row["Summary"] = summary_text if valid_summary else ""
-            enriched_rows.append(out_row)
-
-            status_parts = [
-                f"breakage={ans_breakage if valid_breakage else 'fail'}",
-                f"ceramic={ans_ceramic if valid_ceramic else 'fail'}",
-                f"detected={ans_detected if valid_detected else 'fail'}",
-                f"harm={ans_harm if valid_harm else 'fail'}",
-                f"summary={'ok' if valid_summary else 'fail'}",
-            ]
-            all_valid = all([valid_breakage, valid_ceramic, valid_detected, valid_harm, valid_summary])
-            logger.log(logging.INFO if all_valid else logging.WARNING, f"Row {idx}: " + ", ".join(status_parts))
-
-            row_dt = time.perf_counter() - row_t0
-            logger.info(f"Row {idx} end | duration_sec={row_dt:.3f}")
-
-            if cli_args.delay > 0:
-                time.sleep(cli_args.delay)
+    def emit(out_row: Dict[str, Any]) -> None:
+        writer.write(out_row if out_headers is None else reorder_row(out_row, out_headers))
+
+    # --- Verarbeitung
+    try:
+        asyncio.run(process_rows(rows, emit))
+        logger.info(f"Processed {writer.count} rows.")
     except KeyboardInterrupt:
         logger.warning("Aborted by user during row processing")
+        writer.abort()
         try:
             perf_mon.stop()
             perf_mon.join(timeout=3.0)
@@ -543,39 +1507,18 @@ def main() -> None:
         raise
     except Exception as e:
         logger.error(f"Unexpected error during processing: {e}")
+        writer.abort()
         try:
             perf_mon.stop()
             perf_mon.join(timeout=3.0)
         except Exception:
             pass
         sys.exit(1)
-
-    # --- Preserve original outer structure and write output ---
-    output_obj: Any
-    if isinstance(original_data, dict) and "sheets" in original_data:
-        output_obj = original_data
-        first_sheet_key = next(iter(output_obj["sheets"].keys()))
-        table0 = output_obj["sheets"][first_sheet_key]["excel_tables"][0]
-
-        headers_list = table0.get("headers") or (list(headers) if headers else [])
-        for col in NEW_COLUMNS:
-            if col not in headers_list:
-                headers_list.append(col)
-        table0["headers"] = headers_list
-        table0["rows"] = [reorder_row(r, headers_list) for r in enriched_rows]
-
-    elif isinstance(original_data, list):
-        # BUG FIX: Use the original headers, not inferred ones from the enriched row
-        final_headers = (headers or []) + [col for col in NEW_COLUMNS if col not in (headers or [])]
-        output_obj = [reorder_row(r, final_headers) for r in enriched_rows]
-    else:
-        output_obj = enriched_rows  # Fallback
+    finally:
+        _close_caches()
 
     try:
-        Path(cli_args.out).write_text(
-            json.dumps(output_obj, ensure_ascii=False, indent=2),
-            encoding="utf-8",
-        )
+        writer.close()
         logger.info(f"Wrote output with preserved structure to {cli_args.out}")
         # Performance-Monitor stoppen
         try:
@@ -588,6 +1531,7 @@ def main() -> None:
         logger.info(f"Run finished | total_duration_sec={dt:.3f}")
     except Exception as e:
         logger.error(f"Failed to write output file: {e}")
+        writer.abort()
         try:
             perf_mon.stop()
             perf_mon.join(timeout=3.0)
@@ -5,21 +5,50 @@ Excel -> JSON Strukturextraktion mit Logging und Merged-Cell-Behandlung.
 - Liest alle .xlsx/.xlsm im Script-Verzeichnis
 - Erzeugt je Datei eine {basename}.json und {basename}.log.txt
 - Nutzt echte Excel-"Tables" (falls vorhanden); sonst Fallback auf genutzten Zellbereich
+- Requirements: openpyxl 3.1.x (Merges/Tables im read_only-Modus über openpyxl-Interna;
+  fehlen diese, werden sie aus einem zusätzlich normal geladenen Workbook gelesen)
 Autor: Dein KI-Kumpel :)
 """
 
 from __future__ import annotations
 import json
 import logging
+import os
 import sys
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import date, datetime
 from decimal import Decimal
 from typing import Any, Dict, List, Tuple, Optional
+from xml.etree.ElementTree import iterparse
 
 from openpyxl import load_workbook
+from openpyxl.packaging.relationship import get_dependents, get_rels_path
+from openpyxl.worksheet.table import Table
 from openpyxl.worksheet.worksheet import Worksheet
 from openpyxl.utils import get_column_letter, range_boundaries
+from openpyxl.xml.constants import REL_NS, SHEET_MAIN_NS
+from openpyxl.xml.functions import fromstring
+
+try:
+    from openpyxl.worksheet._read_only import ReadOnlyWorksheet  # nur für Typ-Annotationen (privates Modul)
+except ImportError:
+    ReadOnlyWorksheet = Any
+
+try:
+    import orjson  # optional: schnelles JSON-Schreiben (Rust)
+except Exception:
+    orjson = None
+
+# logging.DEBUG schreibt zusätzlich das Zell-Mapping ("Map: ...") ins Log-File (langsam bei großen Sheets)
+LOG_LEVEL = logging.INFO
+
+SheetValues = List[Tuple[Any, ...]]  # Zellwerte ab A1: values[r - 1][c - 1]
+MergeBounds = Tuple[int, int, int, int]  # (min_col, min_row, max_col, max_row) wie range_boundaries/m.bounds
+MergeRecord = Tuple[int, int, int, int, int, int]  # (min_row, max_row, min_col, max_col, anchor_r, anchor_c)
+# (min_row je Record, Records nach min_row sortiert, max. Höhe - 1 der niedrigen Records, hohe Records)
+MergeIndex = Tuple[List[int], List[MergeRecord], int, List[MergeRecord]]
 
 # ----------------------------
 # Utils
@@ -44,116 +73,248 @@ def json_default(obj: Any) -> Any:
 
 def setup_logger(log_path: Path) -> logging.Logger:
     logger = logging.getLogger(log_path.stem)
-    logger.setLevel(logging.INFO)
+    logger.setLevel(LOG_LEVEL)
     logger.handlers.clear()
-    fmt = logging.Formatter("%(asctime)s | %(levelname)s | %(message)s")
+    # Logfile wird angehängt und kann über Tage laufen -> mit Datum; datefmt spart die Millisekunden
     fh = logging.FileHandler(log_path, encoding="utf-8")
-    fh.setFormatter(fmt)
+    fh.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(message)s", datefmt="%Y-%m-%d %H:%M:%S"))
     logger.addHandler(fh)
-    # Zusätzlich: Konsolen-Ausgabe minimal
+    # Konsole nur für Warnungen/Fehler: INFO-Meldungen landen nur im Logfile.
+    # Workbooks laufen parallel -> Logger-Name (= Log-Stem der Datei) zeigt, woher die Meldung kommt
     sh = logging.StreamHandler(sys.stdout)
-    sh.setFormatter(fmt)
+    sh.setLevel(logging.WARNING)
+    sh.setFormatter(logging.Formatter("%(asctime)s | %(name)s | %(levelname)s | %(message)s", datefmt="%H:%M:%S"))
     logger.addHandler(sh)
     return logger
 
+# Spaltenbuchstaben einmalig vorberechnen (Excel: max. 16384 Spalten = "XFD")
+_COL_LETTERS = [""] + [get_column_letter(i) for i in range(1, 16385)]
+
 def cell_addr(row: int, col: int) -> str:
-    return f"{get_column_letter(col)}{row}"
+    return f"{_COL_LETTERS[col]}{row}"
+
+# ----------------------------
+# Read-only Sheet lesen (Werte gestreamt, Merges/Tables aus dem Sheet-XML)
+# ----------------------------
+
+_MERGE_TAG = f"{{{SHEET_MAIN_NS}}}mergeCell"
+_TABLE_PART_TAG = f"{{{SHEET_MAIN_NS}}}tablePart"
+
+def read_sheet_meta(ws: ReadOnlyWorksheet) -> Tuple[List[MergeBounds], List[Table]]:
+    """
+    Merge-Ranges und Excel-Tables eines read_only-Sheets (ReadOnlyWorksheet kennt weder
+    merged_cells noch tables). Ein schneller XML-Durchlauf ohne Zell-Parsing.
+    """
+    merges: List[MergeBounds] = []
+    table_ids: List[str] = []
+    with ws._get_source() as src:
+        for _, el in iterparse(src):
+            if el.tag == _MERGE_TAG:
+                merges.append(range_boundaries(el.get("ref")))  # einmal parsen, danach nur noch Tupel
+            elif el.tag == _TABLE_PART_TAG:
+                table_ids.append(el.get(f"{{{REL_NS}}}id"))
+            el.clear()
+
+    tables: List[Table] = []
+    if table_ids:
+        archive = ws.parent._archive
+        rels = get_dependents(archive, get_rels_path(ws._worksheet_path))
+        for rel_id in table_ids:
+            tables.append(Table.from_tree(fromstring(archive.read(rels.get(rel_id).Target))))
+    return merges, tables
+
+def read_sheet_meta_full(ws_full: Worksheet) -> Tuple[List[MergeBounds], List[Table]]:
+    """Fallback für read_sheet_meta: dieselben Daten aus dem Sheet eines normal geladenen Workbooks"""
+    return [m.bounds for m in ws_full.merged_cells.ranges], list(ws_full.tables.values())
+
+def read_sheet_values(ws: ReadOnlyWorksheet, merges: List[MergeBounds]) -> Tuple[SheetValues, str]:
+    """
+    Alle Zellwerte eines read_only-Sheets in EINEM sequentiellen Durchlauf (iter_rows, values_only)
+    -> (Zeilen ab A1, Dimension wie calculate_dimension, z.B. "A1:F20").
+    Ohne gespeicherte Dimension zählen auch die Merge-Ranges zum genutzten Bereich (wie im normalen Modus).
+    """
+    try:
+        dim = ws.calculate_dimension()
+    except ValueError:  # Sheet ohne <dimension>
+        dim = "A1:A1"
+    if dim != "A1:A1":
+        return list(ws.iter_rows(min_row=1, min_col=1, values_only=True)), dim
+
+    # Manche Writer speichern eine falsche Dimension ("A1") oder gar keine (z.B. openpyxl write_only,
+    # also auch json2excel) -> echte Größe beim Lesen bestimmen
+    ws.reset_dimensions()
+    values = list(ws.iter_rows(min_row=1, min_col=1, values_only=True))
+    used_rows = [r for r, row in enumerate(values, start=1) if any(v is not None for v in row)]
+    if not used_rows and not merges:
+        return [(None,)], "A1:A1"
+    # Bereich der Werte (falls vorhanden) und aller Merge-Ranges umschließen
+    bounds = list(merges)
+    if used_rows:
+        bounds.append((
+            min(next(c for c, v in enumerate(values[r - 1], start=1) if v is not None) for r in used_rows),
+            used_rows[0], max(len(row) for row in values), used_rows[-1],
+        ))
+    min_col, min_row = min(b[0] for b in bounds), min(b[1] for b in bounds)
+    max_col, max_row = max(b[2] for b in bounds), max(b[3] for b in bounds)
+    values = [row + (None,) * (max_col - len(row)) for row in values[:max_row]]
+    values.extend([(None,) * max_col] * (max_row - len(values)))
+    return values, f"{cell_addr(min_row, min_col)}:{cell_addr(max_row, max_col)}"
+
+def cell_value(values: SheetValues, r: int, c: int) -> Any:
+    """Wert an (r, c); None außerhalb des gelesenen Bereichs"""
+    if r <= len(values):
+        row = values[r - 1]
+        if c <= len(row):
+            return row[c - 1]
+    return None
 
 # ----------------------------
 # Merged Cells Handling
 # ----------------------------
 
-def merged_ranges_info(ws: Worksheet) -> List[Dict[str, Any]]:
-    """Liste aller Merge-Ranges mit Anker und Value (Ankerwert)"""
-    info = []
-    for m in ws.merged_cells.ranges:
-        min_col, min_row, max_col, max_row = m.bounds
+_TALL_MERGE_ROWS = 64  # ab dieser Höhe (Zeilen - 1) gilt ein Merge als "hoch"
+
+def scan_merges(merges: List[MergeBounds], values: SheetValues) -> Tuple[List[Dict[str, Any]], Optional[MergeIndex]]:
+    """
+    Ein Durchlauf über die Merge-Ranges eines Sheets ->
+    (Liste aller Ranges mit Anker und Value (Ankerwert) fürs JSON, Intervall-Index für range_rows_values).
+    Der Index ist None wenn das Sheet keine Merges hat.
+    openpyxl gibt Werte nur in der Ankerzelle zurück; wir merken uns die Beziehung.
+    Ein Record pro Range statt ein Dict-Eintrag pro Zelle: Speicher O(#Ranges) statt O(Summe der Flächen).
+    Hohe Ranges (z.B. ein Header-Merge über 1000 Zeilen) werden separat gehalten, damit sie das
+    bisect-Fenster (max. Höhe) der übrigen Ranges nicht aufblähen.
+    """
+    info: List[Dict[str, Any]] = []
+    records: List[MergeRecord] = []
+    tall: List[MergeRecord] = []
+    max_height = 0
+    for min_col, min_row, max_col, max_row in merges:
         anchor = cell_addr(min_row, min_col)
-        anchor_value = ws.cell(row=min_row, column=min_col).value
         info.append({
-            "range": str(m),
+            # wie str(CellRange): Einzelzelle ohne ":"
+            "range": anchor if (min_col, min_row) == (max_col, max_row) else f"{anchor}:{cell_addr(max_row, max_col)}",
             "anchor": anchor,
             "rows": [min_row, max_row],
             "cols": [min_col, max_col],
-            "value": anchor_value
+            "value": cell_value(values, min_row, min_col)
         })
-    return info
-
-def build_merged_lookup(ws: Worksheet) -> Dict[Tuple[int, int], Tuple[int, int]]:
+        rec = (min_row, max_row, min_col, max_col, min_row, min_col)
+        records.append(rec)
+        height = max_row - min_row
+        if height >= _TALL_MERGE_ROWS:
+            tall.append(rec)
+        elif height > max_height:
+            max_height = height
+    if not records:
+        return info, None
+    records.sort()
+    tall.sort()
+    return info, ([rec[0] for rec in records], records, max_height, tall)
+
+def range_rows_values(
+    values: SheetValues, min_row: int, max_row: int, min_col: int, max_col: int, merge_lu: Optional[MergeIndex]
+) -> List[List[Any]]:
     """
-    Liefert ein Lookup: (r,c) -> (anchor_r, anchor_c) wenn Zelle in einem Merge liegt.
-    openpyxl gibt Werte nur in der Ankerzelle zurück; wir merken uns die Beziehung.
+    Werte der Zeilen min_row..max_row in den Spalten min_col..max_col inkl. Merge-Ankerauflösung.
+    Ein Slice pro gestreamter Zeile; Merges überschreiben nur ihre eigenen Spalten.
+    Sweep über die Zeilen: die aktiven Merges ändern sich nur an Merge-Grenzen (z.B. Spalte A über
+    100 Zeilen gemerged -> einmal aufgenommen statt in jeder Zeile neu gesucht, Ankerwert einmal gelesen).
     """
-    lookup = {}
-    for m in ws.merged_cells.ranges:
-        min_col, min_row, max_col, max_row = m.bounds
-        for r in range(min_row, max_row + 1):
-            for c in range(min_col, max_col + 1):
-                lookup[(r, c)] = (min_row, min_col)
-    return lookup
-
-def get_value_with_merge(ws: Worksheet, r: int, c: int, merge_lu: Dict[Tuple[int, int], Tuple[int, int]]):
-    """Wert der Zelle inkl. Merge-Ankerauflösung"""
-    if (r, c) in merge_lu:
-        ar, ac = merge_lu[(r, c)]
-        return ws.cell(row=ar, column=ac).value
-    return ws.cell(row=r, column=c).value
+    width = max_col - min_col + 1
+    n_values = len(values)
+    out: List[List[Any]] = []
+    # aktive Merges: (max_row, Slice-Start, Slice-Ende, Ankerwert), relativ zu min_col
+    active: List[Tuple[int, int, int, Any]] = []
+    until = 0  # kleinste max_row der aktiven Merges -> erst dann muss aufgeräumt werden
+    if merge_lu is not None:
+        min_rows, records, max_height, tall = merge_lu
+        start = min_row - max_height
+        i, n_records = bisect_left(min_rows, start), len(records)
+        # hohe Ranges, die vor dem Startpunkt des Sweeps beginnen, sind ab der ersten Zeile aktiv
+        for m_min_row, m_max_row, m_min_col, m_max_col, anchor_r, anchor_c in tall:
+            lo, hi = max(m_min_col, min_col), min(m_max_col, max_col)
+            if m_min_row < start and m_max_row >= min_row and lo <= hi:
+                until = m_max_row if not active else min(until, m_max_row)
+                active.append((m_max_row, lo - min_col, hi - min_col + 1, cell_value(values, anchor_r, anchor_c)))
+    for r in range(min_row, max_row + 1):
+        row_vals = list(values[r - 1][min_col - 1:max_col]) if r <= n_values else []
+        if len(row_vals) < width:
+            row_vals.extend([None] * (width - len(row_vals)))
+        if merge_lu is not None:
+            if active and r > until:
+                active = [m for m in active if m[0] >= r]
+                until = min((m[0] for m in active), default=0)
+            # neu beginnende Merges (Records sind nach min_row sortiert)
+            while i < n_records and records[i][0] <= r:
+                _, m_max_row, m_min_col, m_max_col, anchor_r, anchor_c = records[i]
+                i += 1
+                lo, hi = max(m_min_col, min_col), min(m_max_col, max_col)
+                if m_max_row >= r and lo <= hi:
+                    until = m_max_row if not active else min(until, m_max_row)
+                    active.append((m_max_row, lo - min_col, hi - min_col + 1, cell_value(values, anchor_r, anchor_c)))
+            for _, lo, hi, anchor_value in active:
+                row_vals[lo:hi] = [anchor_value] * (hi - lo)
+        out.append(row_vals)
+    return out
 
 # ----------------------------
 # Tabellen-Extraktion (echte Excel Tables)
 # ----------------------------
 
 def unique_headers(headers: List[Any], logger: logging.Logger) -> List[str]:
-    seen = {}
-    out = []
+    # Header werden interniert: sie sind die Keys jedes Zeilen-Dicts (zip in extract_excel_table)
+    seen: Dict[str, int] = {}
+    out: List[str] = []
     for h in headers:
-        base = str(h) if h is not None else ""
-        if base not in seen:
+        base = h if type(h) is str else ("" if h is None else str(h))
+        n = seen.get(base)
+        if n is None:
             seen[base] = 1
-            out.append(base)
+            out.append(sys.intern(base))
         else:
-            seen[base] += 1
-            new_h = f"{base}_{seen[base]}"
+            seen[base] = n + 1
+            new_h = sys.intern(f"{base}_{n + 1}")
             logger.warning(f"Duplizierter Header '{base}' → umbenannt zu '{new_h}'.")
             out.append(new_h)
     return out
 
-def extract_excel_table(ws: Worksheet, table_obj, logger: logging.Logger) -> Dict[str, Any]:
+def extract_excel_table(
+    ws: ReadOnlyWorksheet, table_obj: Table, values: SheetValues,
+    merge_lu: Optional[MergeIndex], merges: List[Dict[str, Any]], logger: logging.Logger
+) -> Dict[str, Any]:
     """
     Extrahiert Struktur & Daten einer Excel-Tabelle (openpyxl.worksheet.table.Table)
+    merge_lu/merges werden einmal pro Sheet gebaut (scan_merges).
     """
     ref = table_obj.ref  # z.B. "A1:D20"
     min_col, min_row, max_col, max_row = range_boundaries(ref)
-    merge_lu = build_merged_lookup(ws)
 
-    # Header-Zeile
-    headers_raw = []
-    for c in range(min_col, max_col + 1):
-        headers_raw.append(get_value_with_merge(ws, min_row, c, merge_lu))
-    headers = unique_headers(headers_raw, logger)
+    # Header-Zeile + Datenzeilen in einem Durchlauf über den Table-Bereich
+    table_rows = range_rows_values(values, min_row, max_row, min_col, max_col, merge_lu)
+    headers = unique_headers(table_rows[0], logger)
 
-    # Datenzeilen
+    # Datenzeilen: Werte positionsgleich zu headers, das Dict entsteht in einem Schritt per zip
+    log_map = logger.isEnabledFor(logging.DEBUG)
+    map_lines: List[str] = []
     rows = []
-    for r in range(min_row + 1, max_row + 1):
-        row_obj = {}
-        for idx, c in enumerate(range(min_col, max_col + 1)):
-            val = get_value_with_merge(ws, r, c, merge_lu)
-            # JSON-freundliche Werte
-            row_obj[headers[idx]] = val
-            # Mapping ins Log
-            logger.info(
-                f"Map: {ws.title}!{cell_addr(r, c)} -> tables['{table_obj.displayName}'].rows[{len(rows)}]['{headers[idx]}']"
+    for r, row_vals in enumerate(table_rows[1:], start=min_row + 1):
+        # Mapping fürs Log sammeln
+        if log_map:
+            map_lines.extend(
+                f"Map: {ws.title}!{cell_addr(r, c)} -> tables['{table_obj.displayName}'].rows[{len(rows)}]['{h}']"
+                for h, c in zip(headers, range(min_col, max_col + 1))
             )
-        rows.append(row_obj)
+        rows.append(dict(zip(headers, row_vals)))
+    if map_lines:
+        logger.debug("\n".join(map_lines))  # ein Log-Record statt einem pro Zelle
 
     # Merged-Cells, die die Tabelle schneiden (zur Transparenz im JSON)
     merges_touching = []
-    for m in ws.merged_cells.ranges:
-        mc = m.bounds  # (min_col, min_row, max_col, max_row) – Achtung Reihenfolge!
-        m_min_col, m_min_row, m_max_col, m_max_row = mc
+    for m in merges:
+        (m_min_row, m_max_row), (m_min_col, m_max_col) = m["rows"], m["cols"]
         # einfache Überschneidungsprüfung
         if not (m_max_col < min_col or m_min_col > max_col or m_max_row < min_row or m_min_row > max_row):
-            merges_touching.append({"range": str(m), "anchor": cell_addr(m_min_row, m_min_col)})
+            merges_touching.append({"range": m["range"], "anchor": m["anchor"]})
 
     return {
         "name": table_obj.displayName,
@@ -168,31 +329,34 @@ def extract_excel_table(ws: Worksheet, table_obj, logger: logging.Logger) -> Dic
 # Fallback: Struktur ohne Excel-Table (genutzter Bereich)
 # ----------------------------
 
-def extract_used_range(ws: Worksheet, logger: logging.Logger) -> Dict[str, Any]:
+def extract_used_range(
+    ws: ReadOnlyWorksheet, values: SheetValues, dim: str,
+    merge_lu: Optional[MergeIndex], merges: List[Dict[str, Any]], logger: logging.Logger
+) -> Dict[str, Any]:
     """
     Wenn kein Excel-Table vorhanden ist: gesamten genutzten Bereich als Raster + Merges dokumentieren.
+    dim ist die Dimension aus read_sheet_values (z.B. "A1:F20" oder "A1:A1" bei leer).
     """
-    dim = ws.calculate_dimension()  # z.B. "A1:F20" (oder "A1:A1" bei leer)
     min_col, min_row, max_col, max_row = range_boundaries(dim)
-    merge_lu = build_merged_lookup(ws)
 
-    grid: List[List[Any]] = []
-    for r in range(min_row, max_row + 1):
-        row_vals = []
-        for c in range(min_col, max_col + 1):
-            v = get_value_with_merge(ws, r, c, merge_lu)
-            row_vals.append(v)
-            logger.info(
+    log_map = logger.isEnabledFor(logging.DEBUG)
+    map_lines: List[str] = []
+    grid = range_rows_values(values, min_row, max_row, min_col, max_col, merge_lu)
+    if log_map:
+        for r in range(min_row, max_row + 1):
+            map_lines.extend(
                 f"Map: {ws.title}!{cell_addr(r, c)} -> used_range[{r - min_row}][{c - min_col}]"
+                for c in range(min_col, max_col + 1)
             )
-        grid.append(row_vals)
+    if map_lines:
+        logger.debug("\n".join(map_lines))  # ein Log-Record statt einem pro Zelle
 
     return {
         "dimensions": dim,
         "row_count": len(grid),
         "col_count": max_col - min_col + 1,
         "grid": grid,
-        "merged_cells": merged_ranges_info(ws)
+        "merged_cells": merges
     }
 
 # ----------------------------
@@ -204,7 +368,8 @@ def process_workbook(xl_path: Path, out_json: Path, out_log: Path) -> None:
     logger.info(f"Starte Verarbeitung: {xl_path.name}")
 
     try:
-        wb = load_workbook(filename=xl_path, data_only=True, read_only=False, keep_links=True)
+        # read_only: Zellwerte werden sequentiell gestreamt statt als Cell-Objekte im Speicher gehalten
+        wb = load_workbook(filename=xl_path, data_only=True, read_only=True, keep_links=True)
         logger.info(f"Workbook geladen. Sheets: {wb.sheetnames}")
     except Exception as e:
         logger.error(f"Workbook konnte nicht geladen werden: {e}")
@@ -215,6 +380,7 @@ def process_workbook(xl_path: Path, out_json: Path, out_log: Path) -> None:
         "sheets": {}
     }
 
+    wb_full = None  # normal geladenes Workbook, nur falls read_sheet_meta an geänderten openpyxl-Interna scheitert
     for ws in wb.worksheets:
         try:
             header = f"{xl_path.name}-{ws.title}"
@@ -224,33 +390,46 @@ def process_workbook(xl_path: Path, out_json: Path, out_log: Path) -> None:
                 "sheet_state": ws.sheet_state,  # visible/hidden/veryHidden
             }
 
+            try:
+                merge_ranges, tables = read_sheet_meta(ws)
+            except AttributeError as e:
+                if wb_full is None:
+                    logger.warning(f"read_only-Metadaten nicht lesbar ({e}) - lade Workbook zusätzlich normal (langsamer).")
+                    wb_full = load_workbook(filename=xl_path, data_only=True, keep_links=True)
+                merge_ranges, tables = read_sheet_meta_full(wb_full[ws.title])
+            values, dim = read_sheet_values(ws, merge_ranges)
+
             # Dokumentiere Merges auf Sheet-Ebene
-            merges = merged_ranges_info(ws)
+            merges, merge_lu = scan_merges(merge_ranges, values)
             if merges:
                 logger.info(f"Merged Ranges: {[m['range'] for m in merges]}")
             sheet_obj["merged_cells"] = merges
 
             # Excel-Tables prüfen
-            tables = list(ws.tables.values())
             if tables:
                 logger.info(f"Gefundene Excel-Tabellen: {[t.displayName for t in tables]}")
                 sheet_tables = []
                 for t in tables:
-                    t_obj = extract_excel_table(ws, t, logger)
+                    t_obj = extract_excel_table(ws, t, values, merge_lu, merges, logger)
                     sheet_tables.append(t_obj)
                 sheet_obj["excel_tables"] = sheet_tables
             else:
-                logger.warning("Keine Excel-Tabellen gefunden. Fallback auf genutzten Bereich.")
-                sheet_obj["used_range"] = extract_used_range(ws, logger)
+                logger.warning(f"Sheet '{ws.title}': keine Excel-Tabellen gefunden. Fallback auf genutzten Bereich.")
+                sheet_obj["used_range"] = extract_used_range(ws, values, dim, merge_lu, merges, logger)
 
             result["sheets"][ws.title] = sheet_obj
 
         except Exception as e:
             logger.error(f"Fehler im Sheet '{ws.title}': {e}", exc_info=True)
+    wb.close()  # read_only hält die Datei offen
 
     try:
-        with out_json.open("w", encoding="utf-8") as f:
-            json.dump(result, f, ensure_ascii=False, indent=2, default=json_default)
+        if orjson is not None:
+            # datetime/date serialisiert orjson selbst; json_default nur noch für Decimal & Co.
+            out_json.write_bytes(orjson.dumps(result, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS, default=json_default))
+        else:
+            with out_json.open("w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=2, default=json_default)
         logger.info(f"JSON geschrieben: {out_json.name}")
     except Exception as e:
         logger.error(f"JSON konnte nicht geschrieben werden: {e}")
@@ -261,6 +440,10 @@ def process_workbook(xl_path: Path, out_json: Path, out_log: Path) -> None:
 # Main
 # ----------------------------
 
+def _process_one(task: Tuple[Path, Path, Path]) -> None:
+    """Worker-Einstieg für den Prozess-Pool (top-level, damit picklebar); Logger entsteht im Worker."""
+    process_workbook(*task)
+
 def main():
     base = script_dir()
 
@@ -269,11 +452,21 @@ def main():
         print("Keine .xlsx/.xlsm im Script-Verzeichnis gefunden.")
         return
 
+    tasks = []
     for xl in excel_files:
         stem = safe_filename_stem(xl)
-        out_json = base / f"{stem}.json"
-        out_log = base / f"{stem}.log.txt"
-        process_workbook(xl, out_json, out_log)
+        tasks.append((xl, base / f"{stem}.json", base / f"{stem}.log.txt"))
+
+    if len(tasks) == 1:
+        _process_one(tasks[0])
+        return
+    # Workbooks sind unabhängig voneinander (eigene JSON/Log-Datei) -> parallel auf allen Kernen
+    with ProcessPoolExecutor(max_workers=min(len(tasks), os.cpu_count() or 1)) as pool:
+        for task, fut in [(task, pool.submit(_process_one, task)) for task in tasks]:
+            try:
+                fut.result()
+            except Exception as e:
+                print(f"Fehler bei {task[0].name}: {e}")
 
 if __name__ == "__main__":
     main()
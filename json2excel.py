@@ -11,19 +11,39 @@ JSON -> Excel (xlsx) Rückkonvertierung für das zuvor definierte JSON-Schema.
 from __future__ import annotations
 import json
 import logging
+import re
 import sys
+import warnings
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Tuple, Union
 from datetime import datetime, date
 from decimal import Decimal
 
 from openpyxl import Workbook
-from openpyxl.worksheet.worksheet import Worksheet
-from openpyxl.worksheet.table import Table, TableStyleInfo
+from openpyxl.worksheet.cell_range import CellRange
+from openpyxl.worksheet.table import Table, TableColumn, TableStyleInfo
 from openpyxl.utils import get_column_letter
 from openpyxl.utils.cell import coordinate_from_string, column_index_from_string
 from openpyxl.utils import range_boundaries
 
+try:
+    from openpyxl.worksheet._write_only import WriteOnlyWorksheet  # nur für Typ-Annotationen (privates Modul)
+except ImportError:
+    WriteOnlyWorksheet = Any
+
+try:
+    import orjson  # optional: schnelles JSON-Lesen (Rust)
+except Exception:
+    orjson = None
+
+# logging.DEBUG schreibt zusätzlich das Zell-Mapping ("Map: ...") ins Log-File (langsam bei großen Sheets)
+LOG_LEVEL = logging.INFO
+
+# Zellplan eines Sheets: Zeile -> {Spalte: Wert} (Tabellen) oder fertige Werteliste ab Spalte A (used_range).
+# write_only-Sheets können nur zeilenweise per append geschrieben werden, daher wird erst gesammelt
+# und am Ende in Zeilenfolge geschrieben.
+CellPlan = Dict[int, Union[Dict[int, Any], List[Any]]]
+
 # ----------------------------
 # Utils & Logging
 # ----------------------------
@@ -36,43 +56,74 @@ def script_dir() -> Path:
 
 def setup_logger(log_path: Path) -> logging.Logger:
     logger = logging.getLogger(log_path.stem)
-    logger.setLevel(logging.INFO)
+    logger.setLevel(LOG_LEVEL)
     logger.handlers.clear()
-    fmt = logging.Formatter("%(asctime)s | %(levelname)s | %(message)s")
+    # Logfile wird angehängt und kann über Tage laufen -> mit Datum; datefmt spart die Millisekunden
     fh = logging.FileHandler(log_path, encoding="utf-8")
-    fh.setFormatter(fmt)
+    fh.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(message)s", datefmt="%Y-%m-%d %H:%M:%S"))
     logger.addHandler(fh)
+    # Konsole nur für Warnungen/Fehler: INFO-Meldungen landen nur im Logfile
     sh = logging.StreamHandler(sys.stdout)
-    sh.setFormatter(fmt)
+    sh.setLevel(logging.WARNING)
+    sh.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(message)s", datefmt="%H:%M:%S"))
     logger.addHandler(sh)
     return logger
 
+# Spaltenbuchstaben einmalig vorberechnen (Excel: max. 16384 Spalten = "XFD")
+_COL_LETTERS = [""] + [get_column_letter(i) for i in range(1, 16385)]
+
 def cell_addr(row: int, col: int) -> str:
-    return f"{get_column_letter(col)}{row}"
+    return f"{_COL_LETTERS[col]}{row}"
 
-def coerce_value(v: Any) -> Any:
-    # Rück-Konvertierungen für einfache Typen (JSON → Excel)
-    if isinstance(v, str):
-        # ISO-Date/Datetime heuristisch: nur wenn eindeutig
+def load_json(jf: Path) -> Any:
+    """Liest die JSON-Datei in einem Stück; orjson wenn vorhanden, json als Fallback (z.B. NaN, das orjson ablehnt)."""
+    raw = jf.read_bytes()
+    if orjson is not None:
         try:
-            if len(v) >= 10 and v[4] == "-" and v[7] == "-":
-                # datetime?
-                try:
-                    return datetime.fromisoformat(v)
-                except Exception:
-                    return date.fromisoformat(v)
-        except Exception:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
             pass
+    return json.loads(raw)
+
+# ISO-Date/Datetime wie von excel2json geschrieben (isoformat), optional mit Zeitzone
+_ISO_RE = re.compile(r"\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?")
+
+def _coerce_str(v: str) -> Any:
+    # ISO-Date/Datetime heuristisch: nur wenn eindeutig; Vorprüfung ohne Exceptions für normale Strings
+    if len(v) < 10 or v[4] != "-" or not _ISO_RE.fullmatch(v):
         return v
-    if isinstance(v, (int, float)):
-        return v
-    if isinstance(v, bool) or v is None:
+    try:
+        # auch reine Datumswerte werden datetime (wie bisher: datetime.fromisoformat akzeptiert sie)
+        return datetime.fromisoformat(v)
+    except ValueError:  # z.B. "2024-13-45" oder "Z" vor Python 3.11
         return v
-    if isinstance(v, (datetime, date, Decimal)):
+
+def _coerce_other(v: Any) -> Any:
+    # Langsamer Weg für Typen außerhalb von _COERCE (z.B. Unterklassen)
+    if isinstance(v, str):
+        return _coerce_str(v)
+    if isinstance(v, (int, float, datetime, date, Decimal)) or v is None:
         return v
-    # Fallback
+    # Fallback (z.B. list/dict aus dem JSON)
     return str(v)
 
+# type(v) -> Konvertierung; None = Wert unverändert übernehmen (str wird in coerce_value direkt behandelt)
+_COERCE = {
+    int: None, float: None, bool: None, type(None): None,
+    datetime: None, date: None, Decimal: None,
+}
+
+def coerce_value(v: Any) -> Any:
+    # Rück-Konvertierungen für einfache Typen (JSON → Excel): ein Dict-Lookup statt isinstance-Kette
+    t = type(v)
+    if t is str:
+        # häufigster Fall inline: normale Strings ohne weiteren Funktionsaufruf zurückgeben
+        if len(v) < 10 or v[4] != "-":
+            return v
+        return _coerce_str(v)
+    fn = _COERCE.get(t, _coerce_other)
+    return v if fn is None else fn(v)
+
 # ----------------------------
 # Sheet-Rekonstruktion
 # ----------------------------
@@ -87,7 +138,8 @@ def ensure_unique_table_name(existing: set, desired: str) -> str:
     existing.add(name)
     return name
 
-def write_merged_ranges(ws: Worksheet, merges: List[Dict[str, Any]], logger: logging.Logger) -> None:
+def write_merged_ranges(ws: WriteOnlyWorksheet, merges: List[Dict[str, Any]], logger: logging.Logger) -> None:
+    """Registriert Merges am Sheet; die Innenzellen leert append_planned_rows (wie ws.merge_cells)."""
     if not merges:
         return
     for m in merges:
@@ -95,29 +147,73 @@ def write_merged_ranges(ws: Worksheet, merges: List[Dict[str, Any]], logger: log
         if not r:
             continue
         try:
-            ws.merge_cells(r)
+            ws.merged_cells.add(CellRange(r))
             logger.info(f"Merged: {ws.title}!{r}")
         except Exception as e:
             logger.warning(f"Merge übersprungen ({ws.title}!{r}): {e}")
 
-def write_used_range(ws: Worksheet, used_range: Dict[str, Any], logger: logging.Logger) -> None:
+def append_planned_rows(ws: WriteOnlyWorksheet, cells: CellPlan) -> None:
+    """
+    Schreibt den Zellplan in Zeilenfolge per ws.append (write_only).
+    Innenzellen registrierter Merges bleiben leer, nur der Anker behält seinen Wert.
+    Merges werden nie zeilenweise aufgezählt: Sweep über die Zeilen mit den jeweils aktiven Ranges.
+    """
+    spans = sorted((cr.min_row, cr.max_row, cr.min_col, cr.max_col) for cr in ws.merged_cells.ranges)
+    active: List[Tuple[int, int, int, int]] = []  # (min_row, max_row, min_col, max_col) der Merges in Zeile r
+    until = 0  # kleinste max_row der aktiven Merges
+    i = 0
+
+    for r in range(1, max(cells, default=0) + 1):
+        if active and r > until:
+            active = [m for m in active if m[1] >= r]
+            until = min((m[1] for m in active), default=0)
+        while i < len(spans) and spans[i][0] <= r:
+            if spans[i][1] >= r:
+                until = spans[i][1] if not active else min(until, spans[i][1])
+                active.append(spans[i])
+            i += 1
+
+        row = cells.get(r)
+        if not row:
+            ws.append([])
+            continue
+        if isinstance(row, list):
+            row_vals = row
+        else:
+            row_vals = [None] * max(row)
+            for c, v in row.items():
+                row_vals[c - 1] = v
+        for m_min_row, _, m_min_col, m_max_col in active:
+            lo = m_min_col + 1 if r == m_min_row else m_min_col
+            hi = min(m_max_col, len(row_vals))
+            if lo <= hi:
+                row_vals[lo - 1:hi] = [None] * (hi - lo + 1)
+        ws.append(row_vals)
+
+def write_used_range(ws: WriteOnlyWorksheet, cells: CellPlan, used_range: Dict[str, Any], logger: logging.Logger) -> None:
     grid: List[List[Any]] = used_range.get("grid") or []
+    log_map = logger.isEnabledFor(logging.DEBUG)
     # optional: dimensions/row_count/col_count werden nicht zwingend benötigt
     for r_idx, row_vals in enumerate(grid, start=1):
-        for c_idx, v in enumerate(row_vals, start=1):
-            addr = cell_addr(r_idx, c_idx)
-            ws.cell(row=r_idx, column=c_idx, value=coerce_value(v))
-            logger.info(f"Map: used_range.grid[{r_idx-1}][{c_idx-1}] -> {ws.title}!{addr}")
+        # ganze Zeile als Liste: wird unverändert per ws.append geschrieben
+        cells[r_idx] = [coerce_value(v) for v in row_vals]
+        if log_map:
+            logger.debug("\n".join(
+                f"Map: used_range.grid[{r_idx-1}][{c_idx-1}] -> {ws.title}!{cell_addr(r_idx, c_idx)}"
+                for c_idx in range(1, len(row_vals) + 1)
+            ))
     # Merges (Sheet-weit oder used_range-spezifisch)
     merges = used_range.get("merged_cells") or []
     write_merged_ranges(ws, merges, logger)
 
-def write_tables(ws: Worksheet, tables_json: List[Dict[str, Any]], logger: logging.Logger) -> None:
+def write_tables(ws: WriteOnlyWorksheet, cells: CellPlan, tables_json: List[Dict[str, Any]], logger: logging.Logger) -> None:
     """
-    Schreibt eine Liste von Tabellen auf das Worksheet.
+    Schreibt eine Liste von Tabellen in den Zellplan des Worksheets.
     Nutzt table['ref'] als Startbereich; passt die Endzeile dynamisch an row_count an.
+    Zeilen sind Dicts (Header -> Wert, wie von excel2json) oder positionsgleiche Listen zu headers.
     """
     existing_names = {t.displayName for t in ws._tables} if hasattr(ws, "_tables") else set()
+    log_map = logger.isEnabledFor(logging.DEBUG)
 
     for t_idx, t in enumerate(tables_json):
         # Basis aus JSON
@@ -126,28 +222,37 @@ def write_tables(ws: Worksheet, tables_json: List[Dict[str, Any]], logger: loggi
         ref = t.get("ref")  # z.B. "A1:D20"
         if not ref:
             # Fallback: lege ab Zeile 1, Spalte 1; Tabellen hintereinander mit Leerzeile
-            start_row = ws.max_row + 2 if ws.max_row > 1 else 1
+            max_row_so_far = max(cells, default=1)
+            start_row = max_row_so_far + 2 if max_row_so_far > 1 else 1
             start_col = 1
         else:
             min_col, min_row, max_col, max_row = range_boundaries(ref)
             start_row, start_col = min_row, min_col
 
-        n_cols = max(len(headers), max((len(r.keys()) for r in rows), default=0))
+        n_cols = max(len(headers), max((len(r) for r in rows), default=0))
         # Spaltenüberschriften schreiben
+        header_vals = []
+        header_cells = cells.setdefault(start_row, {})
         for c in range(n_cols):
             header_val = headers[c] if c < len(headers) else f"Col_{c+1}"
-            addr = cell_addr(start_row, start_col + c)
-            ws.cell(row=start_row, column=start_col + c, value=header_val)
-            logger.info(f"Map: tables[{t_idx}].headers[{c}] -> {ws.title}!{addr}")
+            header_vals.append(header_val)
+            header_cells[start_col + c] = header_val
+            if log_map:
+                logger.debug(f"Map: tables[{t_idx}].headers[{c}] -> {ws.title}!{cell_addr(start_row, start_col + c)}")
 
-        # Daten schreiben
+        # Daten schreiben: pro Zeile eine Werteliste in Spaltenreihenfolge (header_vals = Keys)
+        cols = range(start_col, start_col + n_cols)
         for r_i, row_obj in enumerate(rows, start=1):
-            for c in range(n_cols):
-                key = headers[c] if c < len(headers) else f"Col_{c+1}"
-                val = row_obj.get(key, None)
-                addr = cell_addr(start_row + r_i, start_col + c)
-                ws.cell(row=start_row + r_i, column=start_col + c, value=coerce_value(val))
-                logger.info(f"Map: tables[{t_idx}].rows[{r_i-1}]['{key}'] -> {ws.title}!{addr}")
+            if isinstance(row_obj, list):
+                row_vals = row_obj + [None] * (n_cols - len(row_obj))
+            else:
+                row_vals = [row_obj.get(key) for key in header_vals]
+            cells.setdefault(start_row + r_i, {}).update(zip(cols, map(coerce_value, row_vals)))
+            if log_map:
+                logger.debug("\n".join(
+                    f"Map: tables[{t_idx}].rows[{r_i-1}]['{key}'] -> {ws.title}!{cell_addr(start_row + r_i, c)}"
+                    for key, c in zip(header_vals, cols)
+                ))
 
         # Tabellengrenzen berechnen
         end_row = start_row + len(rows)
@@ -164,7 +269,12 @@ def write_tables(ws: Worksheet, tables_json: List[Dict[str, Any]], logger: loggi
             style = TableStyleInfo(name="TableStyleMedium2", showFirstColumn=False,
                                    showLastColumn=False, showRowStripes=True, showColumnStripes=False)
             tbl.tableStyleInfo = style
-            ws.add_table(tbl)
+            # write_only: Spaltennamen selbst setzen (sonst liest der Writer sie aus den Header-Zellen)
+            tbl.tableColumns = [TableColumn(id=i, name=str(header_val)) for i, header_val in enumerate(header_vals, start=1)]
+            with warnings.catch_warnings():
+                # nur der Hinweis "In write-only mode you must add table columns manually" (Spalten sind gesetzt)
+                warnings.filterwarnings("ignore", message="In write-only mode")
+                ws.add_table(tbl)
             logger.info(f"Table angelegt: name={display_name}, ref={table_ref}")
         except Exception as e:
             logger.warning(f"Table konnte nicht angelegt werden (name={display_name}, ref={table_ref}): {e}")
@@ -176,16 +286,14 @@ def write_tables(ws: Worksheet, tables_json: List[Dict[str, Any]], logger: loggi
                 rng = m.get("range")
                 if rng:
                     try:
-                        ws.merge_cells(rng)
+                        ws.merged_cells.add(CellRange(rng))
                         logger.info(f"Merged (in table): {ws.title}!{rng}")
                     except Exception as e:
                         logger.warning(f"Merge übersprungen (in table {display_name}, {rng}): {e}")
 
 def reconstruct_workbook(json_data: Dict[str, Any], out_xlsx: Path, logger: logging.Logger) -> None:
-    wb = Workbook()
-    # Default-Sheet löschen, wir legen passend neu an
-    default_ws = wb.active
-    wb.remove(default_ws)
+    # write_only: Zeilen werden beim Speichern gestreamt statt als Cell-Objekte gehalten (ohne Default-Sheet)
+    wb = Workbook(write_only=True)
 
     sheets: Dict[str, Any] = json_data.get("sheets") or {}
     if not sheets:
@@ -219,17 +327,20 @@ def reconstruct_workbook(json_data: Dict[str, Any], out_xlsx: Path, logger: logg
         # Tabellen?
         tables = sheet_obj.get("excel_tables")
         used_range = sheet_obj.get("used_range")
+        cells: CellPlan = {}
 
         if tables:
-            write_tables(ws, tables, logger)
+            write_tables(ws, cells, tables, logger)
         elif used_range:
-            write_used_range(ws, used_range, logger)
+            write_used_range(ws, cells, used_range, logger)
         else:
             # Nichts – trotzdem Merges anwenden, falls im JSON vorhanden
             logger.warning(f"Sheet '{ws.title}': weder 'excel_tables' noch 'used_range' vorhanden. Leeres Blatt erstellt.")
 
         # Sheet-Merges zuletzt anwenden (kann außerhalb von Tabellen liegen)
         write_merged_ranges(ws, sheet_merges, logger)
+        # Erst jetzt sind alle Merges bekannt -> Zeilen schreiben
+        append_planned_rows(ws, cells)
 
     # Aktives Blatt auf erstes sichtbares setzen
     if first_visible_title:
@@ -263,8 +374,7 @@ def main():
         logger.info(f"Starte Rekonstruktion: {jf.name}")
 
         try:
-            with jf.open("r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = load_json(jf)
         except Exception as e:
             logger.error(f"JSON konnte nicht gelesen werden: {e}")
             continue